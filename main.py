@@ -1,7 +1,17 @@
+from settings import startup_profile
+
+PROFILE_STARTUP = startup_profile.begin()
+
 import tkinter as tk
 from settings.gui import MusicDownloaderApp
 
 if __name__ == "__main__":
+    if PROFILE_STARTUP:
+        startup_profile.mark("modules imported")
     root = tk.Tk()
     app = MusicDownloaderApp(root)
-    root.mainloop()
\ No newline at end of file
+    if PROFILE_STARTUP:
+        startup_profile.mark("window built")
+        # Queued after the app's own deferred startup, so this fires once the window is up
+        root.after_idle(root.after, 0, startup_profile.report)
+    root.mainloop()
@@ -1,40 +1,202 @@
 # settings/apply_metadata.py
 
-from mutagen.id3 import ID3, TIT2, TPE1, TALB, APIC, TCON
+from mutagen.id3 import ID3, ID3NoHeaderError, TIT2, TPE1, TALB, APIC, TCON
 from mutagen.mp3 import MP3
+from mutagen.mp4 import MP4, MP4Cover
+from mutagen.oggopus import OggOpus
+from mutagen.oggvorbis import OggVorbis
+from mutagen.flac import Picture
+import base64
 import os
 import mimetypes
+from .config import ID3_PADDING
+from .metrics import timed, record_failure
 
-def apply_metadata(file_path, title, artist, album, thumbnail_path=None, genre=None):
-    try:
-        audio = MP3(file_path, ID3=ID3)
+def keep_padding(info):
+    """mutagen padding policy: stay in place when the tags fit, otherwise reserve ID3_PADDING bytes."""
+    if info.padding >= 0:
+        return info.padding
+    return ID3_PADDING
+
+def write_id3_tags(file_path, title, artist, album, genre, cover_data, mime_type):
+    audio = MP3(file_path, ID3=ID3)
+
+    if audio.tags is None:
+        audio.add_tags()
+
+    audio["TIT2"] = TIT2(encoding=3, text=title)
+    audio["TPE1"] = TPE1(encoding=3, text=artist)
+    audio["TALB"] = TALB(encoding=3, text=album)
+    if genre:
+        audio["TCON"] = TCON(encoding=3, text=genre)
+
+    if cover_data:
+        audio["APIC"] = APIC(
+            encoding=3,
+            mime=mime_type,
+            type=3,
+            desc=u"Cover",
+            data=cover_data
+        )
+
+    audio.save(padding=keep_padding)
+
+def write_vorbis_tags(file_path, title, artist, album, genre, cover_data, mime_type):
+    """Vorbis comments for .opus/.ogg; cover art goes in METADATA_BLOCK_PICTURE."""
+    audio = OggOpus(file_path) if file_path.lower().endswith('.opus') else OggVorbis(file_path)
+
+    audio["title"] = title
+    audio["artist"] = artist
+    audio["album"] = album
+    if genre:
+        audio["genre"] = genre
+
+    if cover_data:
+        picture = Picture()
+        picture.type = 3
+        picture.mime = mime_type
+        picture.desc = u"Cover"
+        picture.data = cover_data
+        audio["metadata_block_picture"] = [base64.b64encode(picture.write()).decode('ascii')]
+
+    audio.save(padding=keep_padding)
+
+def write_mp4_tags(file_path, title, artist, album, genre, cover_data, mime_type):
+    """iTunes-style MP4 atoms for .m4a."""
+    audio = MP4(file_path)
+
+    if audio.tags is None:
+        audio.add_tags()
 
-        if audio.tags is None:
-            audio.add_tags()
+    audio["\xa9nam"] = [title]
+    audio["\xa9ART"] = [artist]
+    audio["\xa9alb"] = [album]
+    if genre:
+        audio["\xa9gen"] = [genre]
 
-        audio["TIT2"] = TIT2(encoding=3, text=title or "Unknown Title")
-        audio["TPE1"] = TPE1(encoding=3, text=artist or "Unknown Artist")
-        audio["TALB"] = TALB(encoding=3, text=album or "Unknown Album")
-        if genre:
-            audio["TCON"] = TCON(encoding=3, text=genre)
+    if cover_data:
+        image_format = MP4Cover.FORMAT_PNG if mime_type == 'image/png' else MP4Cover.FORMAT_JPEG
+        audio["covr"] = [MP4Cover(cover_data, imageformat=image_format)]
 
-        if thumbnail_path and os.path.exists(thumbnail_path):
+    audio.save(padding=keep_padding)
+
+# Tag writer per output extension; anything else is treated as MP3
+TAG_WRITERS = {
+    '.mp3': write_id3_tags,
+    '.opus': write_vorbis_tags,
+    '.ogg': write_vorbis_tags,
+    '.m4a': write_mp4_tags,
+    '.mp4': write_mp4_tags,
+}
+
+def apply_metadata(file_path, title, artist, album, thumbnail_path=None, genre=None, cover_data=None):
+    """Write tags in the file's native format; cover art comes from cover_data (JPEG bytes) or thumbnail_path.
+
+    Returns False if the tags could not be written; the error is logged and counted, not raised.
+    """
+    try:
+        mime_type = 'image/jpeg'
+        if cover_data is None and thumbnail_path and os.path.exists(thumbnail_path):
             with open(thumbnail_path, 'rb') as img:
-                # Detect MIME type from file extension
-                mime_type, _ = mimetypes.guess_type(thumbnail_path)
-                if not mime_type or not mime_type.startswith('image/'):
-                    mime_type = 'image/jpeg'  # Default fallback
-
-                audio["APIC"] = APIC(
-                    encoding=3,
-                    mime=mime_type,
-                    type=3,
-                    desc=u"Cover",
-                    data=img.read()
-                )
-
-        audio.save()
+                cover_data = img.read()
+            # Detect MIME type from file extension
+            mime_type, _ = mimetypes.guess_type(thumbnail_path)
+            if not mime_type or not mime_type.startswith('image/'):
+                mime_type = 'image/jpeg'  # Default fallback
+
+        writer = TAG_WRITERS.get(os.path.splitext(file_path)[1].lower(), write_id3_tags)
+        with timed("tag_write"):
+            writer(file_path, title or "Unknown Title", artist or "Unknown Artist", album or "Unknown Album",
+                   genre, cover_data, mime_type)
         print(f"Metadata successfully applied to: {file_path}")
+        return True
 
     except Exception as e:
+        record_failure("tag_write")
         print(f"[ERROR] Failed to apply metadata: {e}")
+        return False
+
+def _update_id3(file_path, fields, cover_data, mime_type, dry_run):
+    try:
+        tags = ID3(file_path)
+    except ID3NoHeaderError:
+        tags = ID3()
+    frames = {'title': TIT2, 'artist': TPE1, 'genre': TCON}
+    changed = []
+    for name, value in fields.items():
+        frame = tags.get(frames[name].__name__)
+        if frame is None or frame.text != [value]:
+            changed.append(name)
+            tags.setall(frames[name].__name__, [frames[name](encoding=3, text=value)])
+    if cover_data is not None:
+        covers = [frame.data for frame in tags.getall('APIC')]
+        if covers != [cover_data]:
+            changed.append('cover')
+            tags.setall('APIC', [APIC(encoding=3, mime=mime_type, type=3, desc=u"Cover", data=cover_data)])
+    if changed and not dry_run:
+        # Keep the ID3 version the file has (ffmpeg writes v2.3)
+        tags.save(file_path, v2_version=3 if tags.version[:2] == (2, 3) else 4, padding=keep_padding)
+    return changed
+
+def _update_vorbis(file_path, fields, cover_data, mime_type, dry_run):
+    audio = OggOpus(file_path) if file_path.lower().endswith('.opus') else OggVorbis(file_path)
+    changed = []
+    for name, value in fields.items():
+        if audio.get(name) != [value]:
+            changed.append(name)
+            audio[name] = value
+    if cover_data is not None:
+        covers = [Picture(base64.b64decode(data)).data for data in audio.get('metadata_block_picture', [])]
+        if covers != [cover_data]:
+            changed.append('cover')
+            picture = Picture()
+            picture.type = 3
+            picture.mime = mime_type
+            picture.desc = u"Cover"
+            picture.data = cover_data
+            audio["metadata_block_picture"] = [base64.b64encode(picture.write()).decode('ascii')]
+    if changed and not dry_run:
+        audio.save(padding=keep_padding)
+    return changed
+
+def _update_mp4(file_path, fields, cover_data, mime_type, dry_run):
+    audio = MP4(file_path)
+    if audio.tags is None:
+        audio.add_tags()
+    atoms = {'title': "\xa9nam", 'artist': "\xa9ART", 'genre': "\xa9gen"}
+    changed = []
+    for name, value in fields.items():
+        if audio.tags.get(atoms[name]) != [value]:
+            changed.append(name)
+            audio[atoms[name]] = [value]
+    if cover_data is not None:
+        if [bytes(cover) for cover in audio.tags.get('covr', [])] != [cover_data]:
+            changed.append('cover')
+            image_format = MP4Cover.FORMAT_PNG if mime_type == 'image/png' else MP4Cover.FORMAT_JPEG
+            audio["covr"] = [MP4Cover(cover_data, imageformat=image_format)]
+    if changed and not dry_run:
+        audio.save(padding=keep_padding)
+    return changed
+
+# Incremental updaters per output extension, like TAG_WRITERS
+TAG_UPDATERS = {
+    '.mp3': _update_id3,
+    '.opus': _update_vorbis,
+    '.ogg': _update_vorbis,
+    '.m4a': _update_mp4,
+    '.mp4': _update_mp4,
+}
+
+def update_tags(file_path, title, artist, genre=None, cover_data=None, mime_type='image/jpeg', dry_run=False):
+    """Bring a file's title/artist/genre (and cover, if cover_data is given) in line, touching only what differs.
+
+    Returns the names of the fields that changed; the file is saved only when
+    that list is non-empty (and never with dry_run). Padding is reused, so a
+    changed frame normally rewrites just the tag header, not the audio.
+    """
+    fields = {'title': title or "Unknown Title", 'artist': artist or "Unknown Artist"}
+    if genre:
+        fields['genre'] = genre
+    updater = TAG_UPDATERS.get(os.path.splitext(file_path)[1].lower(), _update_id3)
+    with timed("tag_write"):
+        return updater(file_path, fields, cover_data, mime_type, dry_run)
@@ -0,0 +1,173 @@
+# settings/artwork.py
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+from PIL import Image
+from .config import ARTWORK_CACHE_DIR, ARTWORK_CACHE_MAX_BYTES
+from .http import fetch_bytes
+from .metrics import timed, record_failure
+
+# Derived variants kept next to each original
+PREVIEW = "preview"   # fits 338x190, shown above the URL entry
+COVER = "cover"       # 500x500 center crop, embedded as the APIC frame
+
+# Layout: urls/<sha1(url)> holds the content hash of what the URL served;
+# objects/<sha256(bytes)>/ holds "original" plus one JPEG per variant. Tracks
+# whose thumbnail URLs differ but serve the same image share one object.
+_URLS_DIR = os.path.join(ARTWORK_CACHE_DIR, "urls")
+_OBJECTS_DIR = os.path.join(ARTWORK_CACHE_DIR, "objects")
+
+# Bytes written since the last eviction scan; scanning on every write would be wasteful
+_written_since_evict = 0
+_evict_lock = threading.Lock()
+
+
+def _url_key(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _read(path):
+    """Read a cache file and bump its mtime, which doubles as the LRU timestamp."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.utime(path)
+        return data
+    except OSError:
+        return None
+
+
+def make_cover(img):
+    # Convert to RGB (JPEG doesn't support alpha)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    # Resize to standard album cover size (square 500x500)
+    size = min(img.width, img.height)
+    left = (img.width - size) // 2
+    top = (img.height - size) // 2
+    img = img.crop((left, top, left + size, top + size))
+    return img.resize((500, 500), Image.LANCZOS)
+
+
+def make_preview(img):
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = img.copy()
+    img.thumbnail((338, 190), Image.LANCZOS)  # 16:9 aspect ratio for preview
+    return img
+
+
+_VARIANTS = {
+    PREVIEW: (make_preview, 90),
+    COVER: (make_cover, 95),
+}
+
+
+def _original_for_url(url):
+    """Return (content_hash, original bytes) for url, fetching only on a cache miss."""
+    index_path = os.path.join(_URLS_DIR, _url_key(url))
+    content_hash = _read(index_path)
+    if content_hash:
+        content_hash = content_hash.decode('ascii')
+        data = _read(os.path.join(_OBJECTS_DIR, content_hash, "original"))
+        if data is not None:
+            return content_hash, data
+
+    with timed("thumbnail_fetch"):
+        data = fetch_bytes(url)
+    content_hash = hashlib.sha256(data).hexdigest()
+    original_path = os.path.join(_OBJECTS_DIR, content_hash, "original")
+    if not os.path.exists(original_path):
+        _write_atomic(original_path, data)
+    _write_atomic(index_path, content_hash.encode('ascii'))
+    _maybe_evict(len(data))
+    return content_hash, data
+
+
+def get_artwork_bytes(url, variant):
+    """JPEG bytes of a derived variant of the image at url, doing image work only once per image.
+
+    Files are written atomically, so concurrent workers at worst duplicate work
+    for the same image; they never see a partial file.
+    """
+    content_hash, original = _original_for_url(url)
+    variant_path = os.path.join(_OBJECTS_DIR, content_hash, f"{variant}.jpg")
+    data = _read(variant_path)
+    if data is not None:
+        return data
+
+    make, quality = _VARIANTS[variant]
+    out = BytesIO()
+    with timed("thumbnail_process"):
+        make(Image.open(BytesIO(original))).save(out, 'JPEG', quality=quality)
+    data = out.getvalue()
+    _write_atomic(variant_path, data)
+    return data
+
+
+def get_cover_bytes(url):
+    """500x500 cover art for an APIC frame, or None if the image cannot be fetched."""
+    try:
+        return get_artwork_bytes(url, COVER)
+    except Exception as e:
+        record_failure("thumbnail_fetch")
+        print(f"Failed to download thumbnail: {e}")
+        return None
+
+
+def get_preview_image(url):
+    """Decoded preview image for the GUI, or None if the image cannot be fetched."""
+    try:
+        return Image.open(BytesIO(get_artwork_bytes(url, PREVIEW)))
+    except Exception as e:
+        print(f"Thumbnail fetch error: {e}")
+        return None
+
+
+def _maybe_evict(written):
+    global _written_since_evict
+    with _evict_lock:
+        _written_since_evict += written
+        if _written_since_evict < ARTWORK_CACHE_MAX_BYTES // 20:
+            return
+        _written_since_evict = 0
+    evict()
+
+
+def evict(max_bytes=ARTWORK_CACHE_MAX_BYTES):
+    """Delete least recently used objects until the cache fits in max_bytes."""
+    objects = []
+    total = 0
+    try:
+        entries = list(os.scandir(_OBJECTS_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        size = 0
+        last_used = 0
+        for f in os.scandir(entry.path):
+            st = f.stat()
+            size += st.st_size
+            last_used = max(last_used, st.st_mtime)
+        objects.append((last_used, size, entry.path))
+        total += size
+
+    objects.sort()
+    for last_used, size, path in objects:
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+    # URL index entries pointing at evicted objects are treated as misses on next read
@@ -0,0 +1,336 @@
+# settings/bench_pipeline.py
+#
+# Offline end-to-end benchmark of the ingest pipeline:
+#
+#     python -m settings.bench_pipeline --tracks 24 --jobs 1,4,16
+#     python -m settings.bench_pipeline --save-baseline bench_baseline.json
+#     python -m settings.bench_pipeline --baseline bench_baseline.json    # exit 1 on regression
+#
+# Synthetic audio and thumbnails are served from a local HTTP server and
+# resolved by a stub yt-dlp extractor, so download_audio runs its real code
+# path (extraction, HTTP download, ffmpeg, artwork, tags, database) without
+# touching the network. Each concurrency level runs in a fresh interpreter
+# with its own data and output folders, so caches start cold and peak RSS is
+# measured per level.
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from yt_dlp.extractor.common import InfoExtractor
+from .config import DOWNLOAD_CONNECTIONS
+
+# Relative slack before a change counts as a regression, and absolute floors
+# below which differences are treated as noise
+DEFAULT_TOLERANCE = 0.2
+NOISE_FLOOR = {'track_p95': 0.05, 'peak_rss_mb': 10.0, 'db_write_p95': 0.005}
+
+
+class BenchIE(InfoExtractor):
+    """Stub extractor for the benchmark server: one metadata request, one audio format, one thumbnail."""
+
+    IE_NAME = 'zeromusic:bench'
+    _VALID_URL = r'https?://127\.0\.0\.1:\d+/watch/(?P<id>[0-9A-Za-z_-]+)'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        base = url.split('/watch/')[0]
+        meta = self._download_json(f'{base}/api/{video_id}.json', video_id)
+        return {
+            'id': video_id,
+            'title': meta['title'],
+            'uploader': meta['uploader'],
+            'webpage_url': url,
+            'formats': [{
+                'format_id': 'bench-aac',
+                'url': f'{base}/audio/{video_id}.m4a',
+                'ext': 'm4a',
+                'acodec': 'mp4a.40.2',
+                'vcodec': 'none',
+                'abr': 128,
+                'filesize': meta['filesize'],
+            }],
+            'thumbnails': [{'url': f'{base}/thumb/{video_id}.jpg', 'width': 1280, 'height': 720}],
+        }
+
+
+def make_fixtures(workdir, tracks, duration):
+    """One synthetic AAC file shared by every track, plus a distinct 1280x720 JPEG per track."""
+    from PIL import Image
+    from .toolchain import get_toolchain
+
+    toolchain = get_toolchain()
+    if toolchain is None:
+        raise RuntimeError("FFmpeg not found. Please install it: brew install ffmpeg")
+    audio = os.path.join(workdir, "audio.m4a")
+    subprocess.run(
+        [toolchain.ffmpeg, '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+         '-c:a', 'aac', '-b:a', '128k', audio],
+        check=True)
+
+    thumbs = []
+    for i in range(tracks):
+        path = os.path.join(workdir, f"thumb-{i}.jpg")
+        color = ((i * 53) % 256, (i * 97) % 256, (i * 151) % 256)
+        Image.new('RGB', (1280, 720), color).save(path, 'JPEG', quality=90)
+        thumbs.append(path)
+    return audio, thumbs
+
+
+def serve_fixtures(audio, thumbs, latency=0.0):
+    """Start the fixture server on a free port; returns (server, base URL)."""
+    with open(audio, 'rb') as f:
+        audio_bytes = f.read()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            match = re.fullmatch(r'/(api|audio|thumb)/([0-9A-Za-z_-]+)\.\w+', self.path)
+            if not match:
+                self.send_error(404)
+                return
+            kind, video_id = match.groups()
+            if kind == 'api':
+                body = json.dumps({'title': f"Bench Track {video_id}", 'uploader': "Bench Artist",
+                                   'filesize': len(audio_bytes)}).encode()
+                content_type = 'application/json'
+            elif kind == 'audio':
+                body, content_type = audio_bytes, 'audio/mp4'
+            else:
+                with open(thumbs[int(video_id) % len(thumbs)], 'rb') as f:
+                    body = f.read()
+                content_type = 'image/jpeg'
+            # Byte ranges, so multi-connection downloads are exercised too
+            status = 200
+            byte_range = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+            if byte_range and kind == 'audio':
+                start = int(byte_range.group(1))
+                end = min(int(byte_range.group(2) or len(body) - 1), len(body) - 1)
+                status = 206
+                self.send_response(status)
+                self.send_header('Content-Range', f"bytes {start}-{end}/{len(body)}")
+                body = body[start:end + 1]
+            else:
+                self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_level(base, tracks, jobs, output_mode, trace_path):
+    """Download tracks with `jobs` concurrent download_audio calls; runs inside the worker process."""
+    from . import metrics
+    from .database import init_db, close_db
+    from .downloader import download_audio, download_thumbnail, register_extractor
+
+    register_extractor(BenchIE)
+    metrics.enable(fmt='json', trace_path=trace_path)
+    init_db()
+
+    def one(index):
+        try:
+            download_audio(f"{base}/watch/{index:04d}", custom_genre="Bench", output_mode=output_mode)
+            return None
+        except Exception as e:
+            return str(e)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        errors = [error for error in pool.map(one, range(tracks)) if error]
+    wall = time.perf_counter() - started
+
+    # Cover art written to disk, served from the now warm artwork cache
+    thumb_times = []
+    with tempfile.TemporaryDirectory() as thumb_dir:
+        for index in range(tracks):
+            thumb_started = time.perf_counter()
+            download_thumbnail(f"{base}/thumb/{index:04d}.jpg", os.path.join(thumb_dir, f"{index}.jpg"))
+            thumb_times.append(time.perf_counter() - thumb_started)
+    close_db()
+
+    stages = {}
+    track_times = []
+    with open(trace_path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record['ok']:
+                track_times.append(record['seconds'])
+            for span in record['spans']:
+                stages.setdefault(span['stage'], []).append(span['seconds'])
+    stages['download_thumbnail'] = thumb_times
+
+    done = tracks - len(errors)
+    return {
+        'jobs': jobs,
+        'tracks': done,
+        'failed': len(errors),
+        'errors': errors[:3],
+        'wall_seconds': round(wall, 3),
+        'tracks_per_min': round(done / wall * 60, 2) if wall else 0.0,
+        'track_p50': percentile(track_times, 50),
+        'track_p95': percentile(track_times, 95),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'db_write_p50': percentile(stages.get('db_insert', []), 50),
+        'db_write_p95': percentile(stages.get('db_insert', []), 95),
+        'stages': {stage: {'count': len(times), 'p50': percentile(times, 50), 'p95': percentile(times, 95)}
+                   for stage, times in stages.items()},
+    }
+
+
+def spawn_level(base, tracks, jobs, output_mode, workdir, connections):
+    """Run one concurrency level in a fresh interpreter with its own data and output folders."""
+    level_dir = os.path.join(workdir, f"jobs-{jobs}")
+    env = dict(os.environ,
+               ZEROMUSIC_DATA_DIR=os.path.join(level_dir, "data"),
+               ZEROMUSIC_OUTPUT_DIR=os.path.join(level_dir, "out"),
+               ZEROMUSIC_MUSIC_AUTO_ADD="",
+               ZEROMUSIC_DOWNLOAD_CONNECTIONS=str(connections),
+               # The local server never throttles; keep the rate limiter out of the measurement
+               ZEROMUSIC_EXTRACT_RATE="1000")
+    cmd = [sys.executable, '-m', 'settings.bench_pipeline', '--worker', base,
+           '--tracks', str(tracks), '--jobs', str(jobs), '--output-mode', output_mode,
+           '--trace-log', os.path.join(level_dir, "trace.log")]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run(cmd, env=env, cwd=root, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"benchmark worker for {jobs} jobs failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.0f}" if seconds is not None else "-"
+
+
+def print_report(results):
+    print(f"{'jobs':>4} {'tracks/min':>10} {'p50 ms':>8} {'p95 ms':>8} {'rss MB':>7} {'db p50':>7} {'db p95':>7} {'failed':>6}")
+    for r in results:
+        print(f"{r['jobs']:>4} {r['tracks_per_min']:>10.1f} {_ms(r['track_p50']):>8} {_ms(r['track_p95']):>8} "
+              f"{r['peak_rss_mb']:>7.0f} {_ms(r['db_write_p50']):>7} {_ms(r['db_write_p95']):>7} {r['failed']:>6}")
+        for error in r['errors']:
+            print(f"     error: {error}")
+    print()
+    print("Per-stage latency, ms (p50 / p95)")
+    stages = sorted({stage for r in results for stage in r['stages']})
+    print(f"{'stage':<20}" + "".join(f"{'jobs=' + str(r['jobs']):>16}" for r in results))
+    for stage in stages:
+        cells = []
+        for r in results:
+            s = r['stages'].get(stage)
+            cells.append(f"{_ms(s['p50'])} / {_ms(s['p95'])}" if s else "-")
+        print(f"{stage:<20}" + "".join(f"{cell:>16}" for cell in cells))
+
+
+def find_regressions(results, baseline, tolerance):
+    """Compare against a stored run; returns human-readable regression lines."""
+    problems = []
+    levels = {str(level['jobs']): level for level in baseline['levels']}
+    for r in results:
+        base = levels.get(str(r['jobs']))
+        if base is None:
+            continue
+        if r['failed'] > base['failed']:
+            problems.append(f"jobs={r['jobs']}: {r['failed']} failed tracks (baseline {base['failed']})")
+        if r['tracks_per_min'] < base['tracks_per_min'] * (1 - tolerance):
+            problems.append(f"jobs={r['jobs']}: {r['tracks_per_min']:.1f} tracks/min (baseline {base['tracks_per_min']:.1f})")
+        for key, floor in NOISE_FLOOR.items():
+            now, then = r.get(key), base.get(key)
+            if now is None or then is None:
+                continue
+            if now > then * (1 + tolerance) and now - then > floor:
+                problems.append(f"jobs={r['jobs']}: {key} {now:.3f} (baseline {then:.3f})")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the download pipeline against a local server.")
+    parser.add_argument('--tracks', type=int, default=24, help="tracks per concurrency level")
+    parser.add_argument('--jobs', default='1,4,16', help="comma separated concurrency levels")
+    parser.add_argument('--duration', type=int, default=30, help="seconds of synthetic audio per track")
+    parser.add_argument('--latency', type=float, default=0.0, help="artificial server latency per request (s)")
+    parser.add_argument('--output-mode', default='mp3', help="output mode to convert to")
+    parser.add_argument('--connections', type=int, default=DOWNLOAD_CONNECTIONS,
+                        help="connections per download (ranged mode needs files of 2 MB or more, see --duration)")
+    parser.add_argument('--baseline', help="baseline JSON to compare against; exits 1 on regression")
+    parser.add_argument('--save-baseline', help="write this run's results as a baseline JSON")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="allowed relative slowdown")
+    parser.add_argument('--json', action='store_true', help="print raw results as JSON")
+    parser.add_argument('--worker', metavar='BASE_URL', help=argparse.SUPPRESS)
+    parser.add_argument('--trace-log', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        # Pipeline prints go to stderr; stdout carries the result line
+        with contextlib.redirect_stdout(sys.stderr):
+            result = run_level(args.worker, args.tracks, int(args.jobs), args.output_mode, args.trace_log)
+        print(json.dumps(result))
+        return 0
+
+    levels = [int(jobs) for jobs in args.jobs.split(',')]
+    with tempfile.TemporaryDirectory(prefix="0music-bench-") as workdir:
+        audio, thumbs = make_fixtures(workdir, args.tracks, args.duration)
+        server, base = serve_fixtures(audio, thumbs, args.latency)
+        try:
+            results = [spawn_level(base, args.tracks, jobs, args.output_mode, workdir, args.connections)
+                       for jobs in levels]
+        finally:
+            server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({'tracks': args.tracks, 'duration': args.duration, 'output_mode': args.output_mode,
+                       'levels': results}, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        problems = find_regressions(results, baseline, args.tolerance)
+        if problems:
+            print("\nRegressions against baseline:")
+            for problem in problems:
+                print(f"  {problem}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# settings/bench_transcode.py
+#
+# Per-track CPU cost of each output mode, measured on already downloaded
+# source streams (e.g. the .webm/.m4a files yt-dlp leaves before conversion):
+#
+#     python -m settings.bench_transcode song1.webm song2.m4a
+
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from .downloader import OUTPUT_MODES, transcode_audio, needs_encode
+from .progress import TrackProgress
+from .toolchain import get_toolchain
+
+
+def probe_acodec(path):
+    toolchain = get_toolchain()
+    out = subprocess.run(
+        [toolchain.ffprobe, '-v', 'error', '-select_streams', 'a:0',
+         '-show_entries', 'stream=codec_name', '-of', 'default=nw=1:nk=1', path],
+        capture_output=True, check=True, text=True, timeout=30).stdout
+    return out.strip() or None
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench_track(source, mode, workdir):
+    """Transcode a copy of source in the given mode; returns (cpu seconds, wall seconds, output size)."""
+    path = os.path.join(workdir, f"{mode}-{os.path.basename(source)}")
+    shutil.copyfile(source, path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    # The same fields fetch_audio provides; EMBED_TAGS_IN_FFMPEG reads the tags and safe_title
+    track = {
+        'url': source,
+        'title': stem,
+        'author': None,
+        'album': None,
+        'genre': None,
+        'thumb_url': None,
+        'safe_title': stem,
+        'filepath': path,
+        'output_mode': mode,
+        'progress': TrackProgress(source),
+        # Keep the EMBED_TAGS_IN_FFMPEG output out of OUTPUT_DIR and the staging folder
+        'out_dir': workdir,
+        'info': {
+            'filepath': path,
+            'ext': os.path.splitext(path)[1].lstrip('.'),
+            'acodec': probe_acodec(path),
+        },
+    }
+    cpu_before, wall_before = _children_cpu(), time.perf_counter()
+    transcode_audio(track)
+    cpu, wall = _children_cpu() - cpu_before, time.perf_counter() - wall_before
+    size = os.path.getsize(track['filepath'])
+    os.remove(track['filepath'])
+    return cpu, wall, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure per-track ffmpeg CPU time for each output mode.")
+    parser.add_argument('sources', nargs='+', help="downloaded source audio files")
+    parser.add_argument('--modes', default=','.join(OUTPUT_MODES), help="comma separated output modes")
+    args = parser.parse_args(argv)
+
+    modes = args.modes.split(',')
+    print(f"{'mode':<8} {'file':<32} {'action':<7} {'cpu s':>8} {'wall s':>8} {'size KB':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        totals = {mode: 0.0 for mode in modes}
+        for source in args.sources:
+            acodec = probe_acodec(source)
+            for mode in modes:
+                cpu, wall, size = bench_track(source, mode, workdir)
+                totals[mode] += cpu
+                action = 'encode' if needs_encode(acodec, mode) else 'copy'
+                print(f"{mode:<8} {os.path.basename(source)[:32]:<32} {action:<7} {cpu:>8.2f} {wall:>8.2f} {size / 1024:>9.0f}")
+        print()
+        for mode in modes:
+            print(f"{mode:<8} mean CPU per track: {totals[mode] / len(args.sources):.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+# settings/cli.py
+#
+# Headless entry point: python -m settings [download] URL... [-f urls.txt] [-w 4]
+#                   python -m settings retag [SONG_ID...] [--artwork]
+#                   python -m settings scan [--full]
+# Never imports tkinter, PIL.ImageTk or vlc, so it runs in minimal containers.
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from .config import (DOWNLOAD_WORKERS, TRANSCODE_WORKERS, DOWNLOAD_CONNECTIONS, RETAG_WORKERS, LIBRARY_SCAN_WORKERS,
+                     LIBRARY_SCAN_SETTLE)
+from .downloader import OUTPUT_MODES
+
+
+class JsonLines:
+    """Thread-safe JSON-lines writer for progress events."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps({'event': event, 'ts': round(time.time(), 3), **fields}, default=str)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+def read_urls(args):
+    """URLs from the command line, --file and stdin ('-' or piped input), in that order."""
+    urls = [u for u in args.urls if u != '-']
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            urls += [line.strip() for line in f]
+    if '-' in args.urls or (not args.urls and not args.file and not sys.stdin.isatty()):
+        urls += [line.strip() for line in sys.stdin]
+    return [u for u in urls if u and not u.startswith('#')]
+
+
+def run_download(args, out):
+    from . import metrics
+    from .jobs import DownloadQueue, DONE, FAILED
+    from .playlist import is_playlist_url, enqueue_playlist
+
+    if args.metrics or args.metrics_path:
+        metrics.enable(path=args.metrics_path, fmt=args.metrics_format, trace_path=args.trace_log)
+
+    urls = read_urls(args)
+    if not urls and not args.resume:
+        print("No URLs given.", file=sys.stderr)
+        return 2
+
+    queue = DownloadQueue(args.workers, args.transcode_workers, output_mode=args.output_mode,
+                          connections=args.connections)
+
+    def on_job(job):
+        fields = {'job': job.id, 'url': job.url, 'state': job.state}
+        if job.state == DONE:
+            fields['title'] = job.title
+            if job.duplicate:
+                fields['duplicate'] = True
+        elif job.state == FAILED:
+            fields['error'] = str(job.error)
+            fields['retryable'] = job.retryable
+        out.emit('job', **fields)
+
+    queue.subscribe(on_job)
+    if not args.no_progress:
+        queue.subscribe_progress(lambda job, event: out.emit('progress', job=job.id, **event))
+    started = time.perf_counter()
+    if args.resume:
+        out.emit('resume', jobs=len(queue.resume()))
+    for url in urls:
+        if is_playlist_url(url):
+            try:
+                queued, skipped = enqueue_playlist(queue, url, custom_genre=args.genre, force=args.force or None)
+                out.emit('playlist', url=url, queued=queued, skipped=skipped)
+            except Exception as e:
+                out.emit('playlist', url=url, error=str(e))
+        else:
+            queue.submit(url, custom_genre=args.genre, force=args.force or None)
+    queue.wait()
+    queue.shutdown()
+    elapsed = time.perf_counter() - started
+
+    jobs = queue.jobs()
+    done = [job for job in jobs if job.state == DONE and not job.duplicate]
+    duplicates = [job for job in jobs if job.duplicate]
+    failed = [job for job in jobs if job.state == FAILED]
+    total_bytes = 0
+    for job in done:
+        try:
+            total_bytes += os.path.getsize(job.track['filepath'])
+        except (OSError, KeyError, TypeError):
+            pass
+
+    stats = queue.stats.summary()
+    out.emit('summary',
+             tracks=len(done),
+             failed=len(failed),
+             duplicates=len(duplicates),
+             elapsed=round(elapsed, 3),
+             tracks_per_s=round(len(done) / elapsed, 4) if elapsed else 0.0,
+             bytes=total_bytes,
+             downloaded_bytes=stats['bytes'],
+             download_mb_per_s=stats['download_mb_per_s'],
+             phase_seconds=stats['phase_seconds'],
+             phase_mean_seconds=stats['phase_mean_seconds'],
+             failures=[{'url': job.url, 'error': str(job.error), 'retryable': job.retryable} for job in failed],
+             metrics_file=metrics.write_metrics())
+    return 1 if failed else 0
+
+
+def run_retag(args, out):
+    from .retag import retag_library
+
+    def on_result(result):
+        # Unchanged files only show up in the summary
+        if result['status'] != 'unchanged':
+            out.emit('file', **result)
+
+    summary = retag_library(args.ids or None, artwork=args.artwork, workers=args.jobs, dry_run=args.dry_run,
+                            on_result=on_result)
+    out.emit('summary', **summary)
+    return 1 if summary['errors'] else 0
+
+
+def run_scan(args, out):
+    from .library_scan import reconcile_library
+    summary = reconcile_library(args.roots or None, full=args.full, workers=args.workers, settle=args.settle)
+    if summary is None:
+        return 1
+    out.emit('summary', **summary)
+    return 1 if summary['errors'] else 0
+
+
+COMMANDS = {
+    'download': run_download,
+    'retag': run_retag,
+    'scan': run_scan,
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="0music", description="Headless 0music downloader.")
+    sub = parser.add_subparsers(dest='command')
+
+    download = sub.add_parser('download', help="download URLs (default command)")
+    download.add_argument('urls', nargs='*', help="video, playlist or channel URLs; '-' reads stdin")
+    download.add_argument('-f', '--file', help="file with one URL per line")
+    download.add_argument('-w', '--workers', type=int, default=DOWNLOAD_WORKERS, help="parallel network downloads")
+    download.add_argument('-c', '--connections', type=int, default=DOWNLOAD_CONNECTIONS,
+                          help="parallel connections per download (byte ranges or DASH fragments)")
+    download.add_argument('--transcode-workers', type=int, default=TRANSCODE_WORKERS, help="parallel ffmpeg jobs")
+    download.add_argument('--output-mode', choices=list(OUTPUT_MODES), default=None, help="audio output mode")
+    download.add_argument('--genre', default=None, help="genre tag for every track")
+    download.add_argument('--force', action='store_true', help="download again even if the video is already in the library")
+    download.add_argument('--resume', action='store_true', help="first re-queue downloads an interrupted run left unfinished")
+    download.add_argument('--no-progress', action='store_true', help="only print job state changes and the summary")
+    download.add_argument('--metrics', action='store_true', help="time every pipeline stage and write a metrics file")
+    download.add_argument('--metrics-format', choices=('prometheus', 'json'), default=None, help="metrics file format")
+    download.add_argument('--metrics-path', default=None, help="metrics file (implies --metrics)")
+    download.add_argument('--trace-log', default=None, help="per-track JSON-lines trace log")
+
+    retag = sub.add_parser('retag', help="write title/author/genre from music.db back into the files")
+    retag.add_argument('ids', nargs='*', type=int, help="song ids (default: the whole library)")
+    retag.add_argument('--artwork', action='store_true', help="also refresh cover art from the YouTube thumbnail")
+    retag.add_argument('-j', '--jobs', type=int, default=RETAG_WORKERS, help="worker processes")
+    retag.add_argument('--dry-run', action='store_true', help="report what would change without saving")
+
+    scan = sub.add_parser('scan', help="index OUTPUT_DIR and the Music auto-add folder into music.db")
+    scan.add_argument('roots', nargs='*', help="folders to scan instead of the configured ones")
+    scan.add_argument('--full', action='store_true', help="re-read every file, ignoring size/mtime/inode stamps")
+    scan.add_argument('-w', '--workers', type=int, default=LIBRARY_SCAN_WORKERS, help="threads reading tags")
+    scan.add_argument('--settle', type=float, default=LIBRARY_SCAN_SETTLE,
+                      help="skip files modified less than this many seconds ago")
+    return parser
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # URLs without a command mean "download"
+    if not argv or argv[0] not in COMMANDS and argv[0] not in ('-h', '--help'):
+        argv.insert(0, 'download')
+    args = build_parser().parse_args(argv)
+
+    # Library code reports with print(); keep stdout for JSON lines only
+    out = JsonLines(sys.stdout)
+    with contextlib.redirect_stdout(sys.stderr):
+        return COMMANDS[args.command](args, out)
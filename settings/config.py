@@ -4,17 +4,115 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # naik 1
 
 # macOS Music app auto-import folder
 HOME_DIR = os.path.expanduser("~")
-MUSIC_AUTO_ADD = os.path.join(HOME_DIR, "Music", "Music", "Media.localized", "Automatically Add to Music.localized")
+# (ZEROMUSIC_MUSIC_AUTO_ADD overrides it; set it empty to never move files there)
+MUSIC_AUTO_ADD = os.environ.get(
+    "ZEROMUSIC_MUSIC_AUTO_ADD",
+    os.path.join(HOME_DIR, "Music", "Music", "Media.localized", "Automatically Add to Music.localized"))
 
 
 # Always use a safe working directory for downloads
-OUTPUT_DIR = os.path.join(HOME_DIR, "Music", "0music")
+OUTPUT_DIR = os.environ.get("ZEROMUSIC_OUTPUT_DIR") or os.path.join(HOME_DIR, "Music", "0music")
 
-# If Music auto-import exists, set a flag for post-processing
-MUSIC_AUTO_ADD_EXISTS = os.path.exists(MUSIC_AUTO_ADD)
+# Converted files wait here before the move into the Music auto-import folder. Default: a hidden
+# folder next to the auto-import folder when it is on another volume than OUTPUT_DIR (so the move
+# is a rename), else OUTPUT_DIR; OUTPUT_DIR is also the fallback when the folder can't be created
+STAGING_DIR = os.environ.get("ZEROMUSIC_STAGING_DIR") or None
+STAGING_DIR_NAME = ".0music-staging"
 
-DB_PATH = os.path.join(BASE_DIR, "settings", "music.db")
+# Library database and caches; ZEROMUSIC_DATA_DIR moves them all (e.g. for benchmarks)
+DATA_DIR = os.environ.get("ZEROMUSIC_DATA_DIR") or os.path.join(BASE_DIR, "settings")
 
-# Pastikan folder ada
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+DB_PATH = os.path.join(DATA_DIR, "music.db")
+
+# Resolved video info cache (separate from music.db so it can be deleted freely)
+INFO_CACHE_PATH = os.path.join(DATA_DIR, "info_cache.db")
+INFO_CACHE_MAX_ENTRIES = int(os.environ.get("ZEROMUSIC_INFO_CACHE_MAX_ENTRIES", "2000"))
+# Stream URL lifetime assumed when a format URL carries no expire= parameter
+INFO_CACHE_DEFAULT_TTL = 3600
+
+# Processed cover art cache (original + preview/cover variants), evicted LRU past the cap
+ARTWORK_CACHE_DIR = os.path.join(DATA_DIR, "artwork_cache")
+ARTWORK_CACHE_MAX_BYTES = int(os.environ.get("ZEROMUSIC_ARTWORK_CACHE_MB", "200")) * 1024 * 1024
+
+# Explicit ffmpeg directory (or binary path); skips probing the usual install locations
+FFMPEG_LOCATION = os.environ.get("ZEROMUSIC_FFMPEG_LOCATION") or None
+
+# Audio output: "mp3" (320k encode), "native" (keep Opus/AAC, remux only), "opus" or "m4a"
+AUDIO_OUTPUT_MODE = os.environ.get("ZEROMUSIC_OUTPUT_MODE", "mp3")
+
+# Write tags and cover art in the ffmpeg conversion itself (MP3/M4A) instead of a mutagen rewrite afterwards
+EMBED_TAGS_IN_FFMPEG = os.environ.get("ZEROMUSIC_EMBED_TAGS_IN_FFMPEG", "0") == "1"
+# Padding reserved in ID3 headers so later re-tags fit in place
+ID3_PADDING = 16 * 1024
+
+# Shared HTTP connection pool for thumbnails and cover art
+HTTP_POOL_SIZE = int(os.environ.get("ZEROMUSIC_HTTP_POOL_SIZE", "10"))
+HTTP_RETRIES = 3
+
+# URL preview lookups: concurrent resolutions and the quiet period before one starts (seconds)
+PREVIEW_WORKERS = 2
+PREVIEW_DEBOUNCE = 0.3
+
+# Warmed-up URLs (info, cover art, format choice) kept for an upcoming Download press
+PREFETCH_MAX_ENTRIES = 4
+
+# Download queue sizing: network fetches and ffmpeg transcodes run on separate pools
+DOWNLOAD_WORKERS = int(os.environ.get("ZEROMUSIC_DOWNLOAD_WORKERS", "3"))
+TRANSCODE_WORKERS = int(os.environ.get("ZEROMUSIC_TRANSCODE_WORKERS", str(os.cpu_count() or 2)))
+
+# Parallel connections per audio download: byte ranges of one HTTP stream, or DASH fragments (1 = single connection)
+DOWNLOAD_CONNECTIONS = int(os.environ.get("ZEROMUSIC_DOWNLOAD_CONNECTIONS", "4"))
+# Ranged downloads: no request asks for more than RANGE_CHUNK_MAX bytes (googlevideo throttles long
+# responses), and files smaller than two RANGE_CHUNK_MIN chunks use a single connection
+RANGE_CHUNK_MAX = 10 * 1024 * 1024
+RANGE_CHUNK_MIN = 1024 * 1024
+
+# Library scanner (settings/library_scan.py): threads reading tags, and how many seconds a file
+# must have been left alone before it is indexed (so downloads in progress are not picked up)
+LIBRARY_SCAN_WORKERS = int(os.environ.get("ZEROMUSIC_SCAN_WORKERS", "8"))
+LIBRARY_SCAN_SETTLE = 30
+# Run a scan in the background when the GUI starts
+LIBRARY_SCAN_ON_STARTUP = os.environ.get("ZEROMUSIC_SCAN_ON_STARTUP", "1") == "1"
+
+# Worker processes for bulk re-tagging (settings/retag.py)
+RETAG_WORKERS = int(os.environ.get("ZEROMUSIC_RETAG_WORKERS", str(os.cpu_count() or 2)))
+
+# Request scheduling per site (settings/scheduler.py): extractions per second and burst size,
+# the ceiling for concurrent media downloads, and how failed requests are retried
+EXTRACT_RATE = float(os.environ.get("ZEROMUSIC_EXTRACT_RATE", "1.0"))
+EXTRACT_BURST = 4
+HOST_CONCURRENCY = int(os.environ.get("ZEROMUSIC_HOST_CONCURRENCY", "8"))
+RETRY_ATTEMPTS = int(os.environ.get("ZEROMUSIC_RETRY_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = 2.0
+THROTTLE_BASE_DELAY = 30.0
+RETRY_MAX_DELAY = 300.0
+# Seconds without throttling before a throttled site gets one step of rate and concurrency back
+THROTTLE_RECOVERY = 60.0
+
+# Minimum seconds between byte-progress events for one track (phase changes are always sent)
+PROGRESS_INTERVAL = 0.25
+
+# Days a download that failed for good stays in the jobs journal before it is pruned
+JOURNAL_FAILED_DAYS = int(os.environ.get("ZEROMUSIC_JOURNAL_FAILED_DAYS", "7"))
+
+# What to do with a URL whose video is already in the library: "skip" (instant, no network) or "refresh"
+DEDUP_POLICY = os.environ.get("ZEROMUSIC_DEDUP", "skip")
+
+# Opt-in stage timing: metrics file (Prometheus text or JSON) plus a per-track JSON-lines trace log
+METRICS_ENABLED = os.environ.get("ZEROMUSIC_METRICS", "0") == "1"
+METRICS_FORMAT = os.environ.get("ZEROMUSIC_METRICS_FORMAT", "prometheus")
+METRICS_PATH = os.environ.get("ZEROMUSIC_METRICS_PATH") or None  # default: settings/metrics.prom or .json
+TRACE_LOG_PATH = os.environ.get("ZEROMUSIC_TRACE_LOG") or os.path.join(DATA_DIR, "trace.log")
+
+
+def ensure_dirs():
+    """Pastikan folder ada. Called on first download / database open rather than at import."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+
+
+def __getattr__(name):
+    # MUSIC_AUTO_ADD_EXISTS is probed when it is read, not when config is imported
+    if name == "MUSIC_AUTO_ADD_EXISTS":
+        return bool(MUSIC_AUTO_ADD) and os.path.exists(MUSIC_AUTO_ADD)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
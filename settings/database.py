@@ -1,10 +1,19 @@
+import json
+import os
+import queue
 import sqlite3
+import threading
+from concurrent.futures import Future
 from .config import DB_PATH
+from .utils import extract_video_id
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
+# Versioned schema. Each entry upgrades the database from the previous version;
+# the current version lives in PRAGMA user_version, so existing music.db files
+# (version 0, music table already present) upgrade in place.
+MIGRATIONS = [
+    # 1: original table
+    [
+        '''
         CREATE TABLE IF NOT EXISTS music (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT,
@@ -14,21 +23,456 @@ def init_db():
             filename TEXT,
             lurl TEXT
         )
-    ''')
-    conn.commit()
-    conn.close()
+        ''',
+    ],
+    # 2: lookup indexes
+    [
+        'CREATE INDEX IF NOT EXISTS idx_music_lurl ON music (lurl)',
+        'CREATE INDEX IF NOT EXISTS idx_music_title ON music (title)',
+        'CREATE INDEX IF NOT EXISTS idx_music_author ON music (author)',
+        'CREATE INDEX IF NOT EXISTS idx_music_downloaded ON music (downloaded)',
+    ],
+    # 3: full-text index over title/author/genre, kept in sync by triggers
+    [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS music_fts USING fts5(
+            title, author, genre,
+            content='music', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS music_fts_insert AFTER INSERT ON music BEGIN
+            INSERT INTO music_fts (rowid, title, author, genre) VALUES (new.id, new.title, new.author, new.genre);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS music_fts_delete AFTER DELETE ON music BEGIN
+            INSERT INTO music_fts (music_fts, rowid, title, author, genre) VALUES ('delete', old.id, old.title, old.author, old.genre);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS music_fts_update AFTER UPDATE OF title, author, genre ON music BEGIN
+            INSERT INTO music_fts (music_fts, rowid, title, author, genre) VALUES ('delete', old.id, old.title, old.author, old.genre);
+            INSERT INTO music_fts (rowid, title, author, genre) VALUES (new.id, new.title, new.author, new.genre);
+        END
+        ''',
+        "INSERT INTO music_fts (music_fts) VALUES ('rebuild')",
+    ],
+    # 4: journal of queued and in-flight downloads, so a restart can pick them up
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            custom_title TEXT,
+            custom_author TEXT,
+            custom_genre TEXT,
+            output_mode TEXT,
+            state TEXT NOT NULL,
+            track TEXT,
+            error TEXT,
+            created DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state)',
+    ],
+    # 5: canonical video id, unique per library; older duplicates keep their row but lose the id
+    [
+        'ALTER TABLE music ADD COLUMN video_id TEXT',
+        'UPDATE music SET video_id = video_id_from_url(lurl) WHERE lurl IS NOT NULL',
+        '''
+        UPDATE music SET video_id = NULL
+        WHERE video_id IS NOT NULL
+          AND id NOT IN (SELECT MIN(id) FROM music WHERE video_id IS NOT NULL GROUP BY video_id)
+        ''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_music_video_id ON music (video_id)',
+    ],
+    # 6: where each file lives and what the library scanner last saw of it (settings/library_scan.py)
+    [
+        'ALTER TABLE music ADD COLUMN path TEXT',
+        'ALTER TABLE music ADD COLUMN size INTEGER',
+        'ALTER TABLE music ADD COLUMN mtime_ns INTEGER',
+        'ALTER TABLE music ADD COLUMN inode INTEGER',
+        'ALTER TABLE music ADD COLUMN duration REAL',
+        'ALTER TABLE music ADD COLUMN bitrate INTEGER',
+        'ALTER TABLE music ADD COLUMN codec TEXT',
+        'ALTER TABLE music ADD COLUMN missing INTEGER NOT NULL DEFAULT 0',
+        'CREATE INDEX IF NOT EXISTS idx_music_path ON music (path)',
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Writes queued within this many items of each other share one transaction
+WRITE_BATCH_SIZE = 100
+
+_db_path = DB_PATH
+_local = threading.local()
+_change_listeners = []
+_change_lock = threading.Lock()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _open(path):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA cache_size=-16000')  # 16 MB
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
+
+
+class _Writer(threading.Thread):
+    """Single thread that owns the write connection and batches queued writes.
+
+    Every write is a callable taking the connection. Whatever is queued when
+    the thread wakes up runs in one transaction, each call inside its own
+    savepoint so a failing write does not roll back its neighbours.
+    """
+
+    def __init__(self, path):
+        super().__init__(name="0music-db-writer", daemon=True)
+        self.path = path
+        self.queue = queue.Queue()
+        # Resolved once the schema is migrated; readers wait on it before their first query
+        self.ready = Future()
+
+    def submit(self, fn):
+        future = Future()
+        self.queue.put((fn, future))
+        return future
+
+    def stop(self):
+        self.queue.put(None)
+        self.join()
+
+    def run(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = _open(self.path)
+            conn.isolation_level = None  # transactions are managed explicitly below
+            conn.execute('BEGIN IMMEDIATE')
+            _migrate(conn)
+            conn.execute('COMMIT')
+            self.ready.set_result(True)
+        except Exception as e:
+            self.ready.set_exception(e)
+            raise
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None)
+                    break
+                batch.append(item)
+            self._run_batch(conn, batch)
+        conn.close()
+
+    def _run_batch(self, conn, batch):
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for fn, future in batch:
+                conn.execute('SAVEPOINT write')
+                try:
+                    results.append((future, fn(conn), None))
+                    conn.execute('RELEASE write')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write')
+                    conn.execute('RELEASE write')
+                    results.append((future, None, e))
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for fn, future in batch:
+                future.set_exception(e)
+            return
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
 
-def add_song(title, filename, author, genre, downloaded, lurl):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO music (title, author, genre, downloaded, filename, lurl) VALUES (?, ?, ?, ?, ?, ?)', (title, author, genre, downloaded, filename, lurl))
-    conn.commit()
-    conn.close()
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = _Writer(_db_path)
+            _writer.start()
+        return _writer
+
+
+def submit_write(fn):
+    """Queue fn(conn) on the writer thread; returns a Future with its result."""
+    return _get_writer().submit(fn)
+
+
+def execute_write(sql, params=()):
+    """Run one write statement through the writer thread and wait for it to commit."""
+    return submit_write(lambda conn: conn.execute(sql, params).lastrowid).result()
+
+
+def get_connection():
+    """Per-thread read connection, reused across calls."""
+    _get_writer().ready.result()
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != _db_path:
+        conn = _open(_db_path)
+        _local.conn = conn
+        _local.path = _db_path
+    return conn
+
+
+def set_db_path(path):
+    """Point the database layer at another file (benchmarks, alternative libraries)."""
+    global _db_path
+    close_db()
+    _db_path = path
+
+
+def close_db():
+    """Flush pending writes and stop the writer thread."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None and writer.is_alive():
+        writer.stop()
+
+
+def _migrate(conn):
+    # Used by migration 5 to backfill video ids from stored URLs
+    conn.create_function('video_id_from_url', 1, extract_video_id, deterministic=True)
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        for sql in statements:
+            conn.execute(sql)
+        conn.execute(f'PRAGMA user_version = {number}')
+    return SCHEMA_VERSION
+
+
+def init_db():
+    """Open the database and bring its schema up to SCHEMA_VERSION."""
+    _get_writer().ready.result()
+
+
+def subscribe_changes(callback):
+    """Register callback(kind, song_id) for committed library changes; returns an unsubscribe function.
+
+    kind is 'insert', 'update' or 'delete'. Callbacks run on the thread that made
+    the change, so GUI code must hop back onto its own thread.
+    """
+    with _change_lock:
+        _change_listeners.append(callback)
+
+    def unsubscribe():
+        with _change_lock:
+            if callback in _change_listeners:
+                _change_listeners.remove(callback)
+    return unsubscribe
+
+def notify_change(kind, song_id):
+    with _change_lock:
+        listeners = list(_change_listeners)
+    for callback in listeners:
+        try:
+            callback(kind, song_id)
+        except Exception as e:
+            print(f"[ERROR] Library change listener failed: {e}")
+
+
+def add_song(title, filename, author, genre, downloaded, lurl, video_id=None, path=None):
+    """Insert a song, or refresh the existing row for the same video id (or file path); returns the row id."""
+    video_id = video_id or extract_video_id(lurl or '')
+    values = (title, author, genre, downloaded, filename, lurl)
+
+    def write(conn):
+        row = conn.execute('SELECT id FROM music WHERE video_id = ?', (video_id,)).fetchone() if video_id else None
+        if row is None and path:
+            # The library scanner may have picked the file up before this row was written
+            row = conn.execute('SELECT id FROM music WHERE path = ? AND video_id IS NULL', (path,)).fetchone()
+        if row:
+            conn.execute('UPDATE music SET title = ?, author = ?, genre = ?, downloaded = ?, filename = ?, lurl = ?, '
+                         'video_id = ?, path = COALESCE(?, path), missing = 0 WHERE id = ?',
+                         values + (video_id, path, row[0]))
+            return row[0], 'update'
+        cursor = conn.execute(
+            'INSERT INTO music (title, author, genre, downloaded, filename, lurl, video_id, path) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            values + (video_id, path))
+        return cursor.lastrowid, 'insert'
+
+    song_id, kind = submit_write(write).result()
+    notify_change(kind, song_id)
+    return song_id
+
+def find_song(video_id):
+    """(id, title, filename) of the library song with this canonical video id, or None."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT id, title, filename FROM music WHERE video_id = ?", (video_id,))
+    return cursor.fetchone()
+
+def get_song_video_ids():
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT video_id FROM music WHERE video_id IS NOT NULL")
+    return {row[0] for row in cursor.fetchall()}
+
+def get_filename_owners(stem):
+    """Video ids of library songs whose file is named stem.<ext>."""
+    cursor = get_connection().cursor()
+    prefix = f"{stem}."
+    cursor.execute("SELECT video_id FROM music WHERE substr(filename, 1, ?) = ?", (len(prefix), prefix))
+    return {row[0] for row in cursor.fetchall()}
 
 def get_all_songs():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute("SELECT * FROM music ORDER BY id ASC")
-    rows = cursor.fetchall()
-    conn.close()
+    return cursor.fetchall()
+
+def get_songs_after(after_id, limit):
+    """Keyset page of (id, title, author) rows in library order, starting after after_id."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT id, title, author FROM music WHERE id > ? ORDER BY id ASC LIMIT ?", (after_id, limit))
+    return cursor.fetchall()
+
+def get_songs_at(offset, limit):
+    """Page of (id, title, author) rows starting at a row offset, for jumps where no keyset anchor is known."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT id, title, author FROM music ORDER BY id ASC LIMIT ? OFFSET ?", (limit, offset))
+    return cursor.fetchall()
+
+def get_songs_for_retag(ids=None):
+    """(id, title, author, genre, filename, video_id, path) rows of the whole library, or of the given song ids."""
+    cursor = get_connection().cursor()
+    if ids is None:
+        cursor.execute("SELECT id, title, author, genre, filename, video_id, path FROM music ORDER BY id ASC")
+        return cursor.fetchall()
+    rows = []
+    ids = list(ids)
+    # Stay under SQLite's bound-parameter limit
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        cursor.execute(f"SELECT id, title, author, genre, filename, video_id, path FROM music WHERE id IN "
+                       f"({', '.join('?' for _ in chunk)}) ORDER BY id ASC", chunk)
+        rows += cursor.fetchall()
     return rows
+
+def get_scan_rows():
+    """(id, filename, path, size, mtime_ns, inode, missing) for every song, for the library scanner."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT id, filename, path, size, mtime_ns, inode, missing FROM music")
+    return cursor.fetchall()
+
+def apply_scan(updates=(), inserts=(), missing_ids=()):
+    """Write one batch of library scan results in a single transaction; returns the ids of inserted songs.
+
+    updates: (path, size, mtime_ns, inode, duration, bitrate, codec, id) tuples for known songs;
+    inserts: (title, author, genre, filename, path, size, mtime_ns, inode, duration, bitrate, codec)
+    tuples for files added by hand; missing_ids: songs whose file is gone.
+    """
+    def write(conn):
+        conn.executemany('UPDATE music SET path = ?, size = ?, mtime_ns = ?, inode = ?, duration = ?, bitrate = ?, '
+                         'codec = ?, missing = 0 WHERE id = ?', updates)
+        conn.executemany('UPDATE music SET missing = 1 WHERE id = ?', [(song_id,) for song_id in missing_ids])
+        return [conn.execute('INSERT INTO music (title, author, genre, filename, path, size, mtime_ns, inode, '
+                             'duration, bitrate, codec) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', row).lastrowid
+                for row in inserts]
+
+    inserted = submit_write(write).result()
+    for song_id in inserted:
+        notify_change('insert', song_id)
+    return inserted
+
+def get_song_urls():
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT lurl FROM music WHERE lurl IS NOT NULL")
+    return {row[0] for row in cursor.fetchall()}
+
+def build_fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix.
+
+    Words are quoted so characters like - or : are never parsed as FTS syntax.
+    """
+    words = [w.replace('"', '""') for w in text.split()]
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words[:-1]]
+    terms.append(f'"{words[-1]}"*')
+    return ' '.join(terms)
+
+def search_songs(text, limit=50, offset=0):
+    """Ranked full-text search over title/author/genre.
+
+    Returns (id, title, author, genre) rows, best matches first (bm25, with
+    title weighted above author above genre). An empty query lists the newest songs.
+    """
+    cursor = get_connection().cursor()
+    query = build_fts_query(text)
+    if query is None:
+        cursor.execute("SELECT id, title, author, genre FROM music ORDER BY id DESC LIMIT ? OFFSET ?", (limit, offset))
+    else:
+        cursor.execute(
+            "SELECT m.id, m.title, m.author, m.genre FROM music_fts f JOIN music m ON m.id = f.rowid "
+            "WHERE music_fts MATCH ? ORDER BY bm25(music_fts, 10.0, 5.0, 1.0) LIMIT ? OFFSET ?",
+            (query, limit, offset))
+    return cursor.fetchall()
+
+def count_songs(text=''):
+    cursor = get_connection().cursor()
+    query = build_fts_query(text)
+    if query is None:
+        cursor.execute("SELECT COUNT(*) FROM music")
+    else:
+        cursor.execute("SELECT COUNT(*) FROM music_fts WHERE music_fts MATCH ?", (query,))
+    return cursor.fetchone()[0]
+
+def journal_add(url, custom_title, custom_author, custom_genre, output_mode, state):
+    """Record a newly queued download; returns its journal id."""
+    return execute_write(
+        'INSERT INTO jobs (url, custom_title, custom_author, custom_genre, output_mode, state) VALUES (?, ?, ?, ?, ?, ?)',
+        (url, custom_title, custom_author, custom_genre, output_mode, state))
+
+def journal_update(job_id, state, track=None, error=None):
+    """Record a stage transition. track (a JSON-able dict) is kept until replaced; returns the write's Future.
+
+    Writes are queued, not waited for: the single writer thread keeps them in order.
+    """
+    track_json = json.dumps(track) if track is not None else None
+    return submit_write(lambda conn: conn.execute(
+        'UPDATE jobs SET state = ?, track = COALESCE(?, track), error = ?, updated = CURRENT_TIMESTAMP WHERE id = ?',
+        (state, track_json, str(error) if error is not None else None, job_id)))
+
+def journal_remove(job_id):
+    """Forget a job once its song is in the library."""
+    return submit_write(lambda conn: conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,)))
+
+def journal_prune(state, max_age_days):
+    """Drop journal rows left in state (e.g. failed for good) that have not changed for max_age_days."""
+    return submit_write(lambda conn: conn.execute(
+        "DELETE FROM jobs WHERE state = ? AND updated < datetime('now', ?)", (state, f"-{max_age_days} days")))
+
+def get_unfinished_jobs(final_states=('done', 'failed')):
+    """Journal rows of jobs that never reached a final state, oldest first.
+
+    Returns (id, url, custom_title, custom_author, custom_genre, output_mode, state, track) tuples,
+    with track decoded from JSON (or None).
+    """
+    cursor = get_connection().cursor()
+    placeholders = ', '.join('?' for _ in final_states)
+    cursor.execute(
+        f"SELECT id, url, custom_title, custom_author, custom_genre, output_mode, state, track FROM jobs "
+        f"WHERE state NOT IN ({placeholders}) ORDER BY id ASC", tuple(final_states))
+    return [row[:7] + (json.loads(row[7]) if row[7] else None,) for row in cursor.fetchall()]
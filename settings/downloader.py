@@ -1,55 +1,47 @@
 # settings/downloader.py
 
 from yt_dlp import YoutubeDL
-from PIL import Image
-import requests
-from io import BytesIO
+from yt_dlp.utils import DownloadError, ReExtractInfo
+from yt_dlp.postprocessor import FFmpegExtractAudioPP
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+import copy
+import glob
+import itertools
 import os
+import subprocess
 import sys
-import tempfile
-from .utils import sanitize_filename
-from .config import OUTPUT_DIR
-from .database import add_song
+import threading
+import time
+from .utils import sanitize_filename, extract_video_id
+from .toolchain import get_toolchain
+from .artwork import get_cover_bytes, get_preview_image
+from .info_cache import get_cached_info, put_cached_info, is_info_fresh, trim_info
+from .config import (ensure_dirs, OUTPUT_DIR, AUDIO_OUTPUT_MODE, EMBED_TAGS_IN_FFMPEG, ID3_PADDING, PREFETCH_MAX_ENTRIES,
+                     DEDUP_POLICY, DOWNLOAD_CONNECTIONS)
+from .database import add_song, find_song, get_filename_owners
 from .apply_metadata import apply_metadata
+from .progress import TrackProgress, RESOLVING, DOWNLOADING, TRANSCODING, TAGGING
+from .metrics import Trace, timed, record_retry
+from .ranged_download import RangedYoutubeDL
+from .scheduler import RequestScheduler
 from datetime import datetime
 
 def get_ffmpeg_path():
-    """Get the path to ffmpeg binaries (system installation)."""
-    import subprocess
-    import shutil
-    
-    # Common ffmpeg locations on macOS
-    common_paths = [
-        '/opt/homebrew/bin',  # Apple Silicon Homebrew
-        '/usr/local/bin',     # Intel Homebrew
-        '/usr/bin',           # System
-    ]
-    
-    # Check common locations for ffmpeg
-    for path in common_paths:
-        ffmpeg = os.path.join(path, 'ffmpeg')
-        ffprobe = os.path.join(path, 'ffprobe')
-        if os.path.exists(ffmpeg) and os.path.exists(ffprobe):
-            try:
-                subprocess.run([ffmpeg, '-version'], capture_output=True, check=True, timeout=5)
-                return path
-            except (subprocess.SubprocessError, OSError):
-                continue
-    
-    # Try to find via shutil.which (works in development)
-    ffmpeg_which = shutil.which('ffmpeg')
-    if ffmpeg_which:
-        return os.path.dirname(ffmpeg_which)
-    
-    return None
-
-def get_ydl_opts(quiet=True):
-    """Get common yt-dlp options with bot bypass settings."""
-    ffmpeg_location = get_ffmpeg_path()
+    """Get the directory holding the ffmpeg binaries (system installation)."""
+    toolchain = get_toolchain()
+    return toolchain.directory if toolchain else None
 
+@lru_cache(maxsize=8)
+def _base_ydl_opts(quiet, ffmpeg_location):
     opts = {
         'quiet': quiet,
         'no_warnings': True,
+        # Progress is reported through progress_hooks (settings/progress.py), not the console bar
+        'noprogress': quiet,
+        # A watch URL with &list= is one track; playlists go through settings/playlist.py
+        'noplaylist': True,
         'extractor_args': {
             'youtube': {
                 'player_client': ['web', 'android'],
@@ -59,86 +51,263 @@ def get_ydl_opts(quiet=True):
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'en-us,en;q=0.5',
-        }
+        },
+        'ffmpeg_location': ffmpeg_location,
     }
-    
-    # Only set ffmpeg_location if we found ffmpeg
-    if ffmpeg_location:
-        opts['ffmpeg_location'] = ffmpeg_location
-    else:
-        raise RuntimeError("FFmpeg not found. Please install it: brew install ffmpeg")
-    
     return opts
 
-def download_thumbnail(thumb_url, save_path):
-    """Download thumbnail image and save to file."""
+def get_ydl_opts(quiet=True):
+    """Get common yt-dlp options with bot bypass settings.
+
+    The option dict is built once per ffmpeg location; callers get a copy they
+    are free to update.
+    """
+    ffmpeg_location = get_ffmpeg_path()
+    if not ffmpeg_location:
+        raise RuntimeError("FFmpeg not found. Please install it: brew install ffmpeg")
+    return copy.deepcopy(_base_ydl_opts(quiet, ffmpeg_location))
+
+# Extra yt-dlp extractors consulted before the built-in ones (the offline benchmark registers one)
+_extra_extractors = []
+
+def register_extractor(ie_class):
+    """Make resolve_info use ie_class for the URLs it matches."""
+    if ie_class not in _extra_extractors:
+        _extra_extractors.append(ie_class)
+
+def _extract_info(ydl, url, download):
+    """ydl.extract_info, routed to a registered extractor when one claims the URL."""
+    for ie_class in _extra_extractors:
+        if ie_class.suitable(url):
+            ydl.add_info_extractor(ie_class())
+            return ydl.extract_info(url, download=download, ie_key=ie_class.ie_key())
+    return ydl.extract_info(url, download=download)
+
+# Shared by every extraction and media download in the process: per-site rate
+# and concurrency limits, backoff and retries (settings/scheduler.py)
+_scheduler = RequestScheduler()
+
+def get_scheduler():
+    return _scheduler
+
+# Number of full extractor round trips per URL, so we can see what each track cost
+_extraction_counts = Counter()
+_extraction_lock = threading.Lock()
+_resolving = {}
+
+def _count_extraction(url):
+    with _extraction_lock:
+        _extraction_counts[url] += 1
+
+def get_extraction_count(url):
+    """Return how many yt-dlp extractions have been run for url in this process."""
+    with _extraction_lock:
+        return _extraction_counts[url]
+
+def reset_extraction_counts():
+    with _extraction_lock:
+        _extraction_counts.clear()
+
+def resolve_info(url, use_cache=True):
+    """Resolve url with yt-dlp once; the returned info dict can be reused for preview and download.
+
+    A cached info whose stream URLs have not expired is returned without any
+    network access.
+    """
+    if use_cache:
+        cached, fresh = get_cached_info(url)
+        if fresh:
+            return cached
+
+    # Single flight: callers racing on the same URL (preview, prefetch, download) share one extraction
+    with _extraction_lock:
+        future = _resolving.get(url)
+        owner = future is None
+        if owner:
+            future = _resolving[url] = Future()
+    if not owner:
+        return future.result()
+
+    def extract():
+        with timed("extract"), YoutubeDL(get_ydl_opts()) as ydl:
+            return _extract_info(ydl, url, download=False)
+
     try:
-        response = requests.get(thumb_url, timeout=10)
-        response.raise_for_status()
-        img = Image.open(BytesIO(response.content))
-        # Convert to RGB (JPEG doesn't support alpha)
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
-        # Resize to standard album cover size (square 500x500)
-        size = min(img.width, img.height)
-        left = (img.width - size) // 2
-        top = (img.height - size) // 2
-        img = img.crop((left, top, left + size, top + size))
-        img = img.resize((500, 500), Image.LANCZOS)
-        img.save(save_path, 'JPEG', quality=95)
-        return save_path
+        info = _scheduler.run(url, "extract", extract)
+        _count_extraction(url)
+        try:
+            put_cached_info(url, info)
+        except Exception as e:
+            print(f"Warning: could not cache info for {url}: {e}")
+        future.set_result(info)
+        return info
     except Exception as e:
-        print(f"Failed to download thumbnail: {e}")
+        future.set_exception(e)
+        raise
+    finally:
+        with _extraction_lock:
+            _resolving.pop(url, None)
+
+def canonical_video_id(url, info=None):
+    """Library identity of a video: the YouTube ID for any URL spelling, else "<extractor>:<id>".
+
+    Returns None when the URL is not a YouTube link and no info is at hand yet.
+    """
+    video_id = extract_video_id(url)
+    if video_id:
+        return video_id
+    if info and info.get('id'):
+        extractor = (info.get('extractor_key') or info.get('ie_key') or '').lower()
+        return info['id'] if extractor == 'youtube' else f"{extractor}:{info['id']}"
+    return None
+
+def dedup_force(force=None):
+    """Resolve a per-call force flag against DEDUP_POLICY."""
+    return DEDUP_POLICY == 'refresh' if force is None else force
+
+# File name stems claimed by downloads in flight, so two jobs never share an outtmpl or .part file
+_reserved_titles = set()
+_titles_lock = threading.Lock()
+# Leftovers of an interrupted download or conversion, not finished files
+PARTIAL_SUFFIXES = ('.part', '.ranges', '.ytdl')
+
+def _files_named(stem):
+    """Finished files called stem.<ext> in OUTPUT_DIR or the Music auto-import folder."""
+    from .config import MUSIC_AUTO_ADD
+    for folder in (OUTPUT_DIR, MUSIC_AUTO_ADD):
+        if not folder:
+            continue
+        for path in glob.glob(os.path.join(glob.escape(folder), f"{glob.escape(stem)}.*")):
+            name = os.path.basename(path)
+            if not name.endswith(PARTIAL_SUFFIXES) and '.temp.' not in name:
+                yield path
+
+def _title_taken(stem, video_id):
+    if stem in _reserved_titles:
+        return True
+    owners = get_filename_owners(stem)
+    # Songs without a video id (scanned, hand-added, older rows) own their file just the same
+    if any(owner is None or owner != video_id for owner in owners):
+        return True
+    # A file nobody recorded for this video is not ours to overwrite
+    return video_id not in owners and next(_files_named(stem), None) is not None
+
+def reserve_safe_title(title, video_id=None):
+    """Claim a file name stem for a new download; give it back with release_safe_title.
+
+    The stem is the sanitized title. If another song, a file on disk or a
+    download in flight already uses it, the video id is appended (then a number).
+    """
+    base = sanitize_filename(title) or "Unknown Title"
+    if video_id:
+        base_tagged = f"{base} [{sanitize_filename(video_id)}]"
+        candidates = itertools.chain((base, base_tagged), (f"{base_tagged} ({n})" for n in itertools.count(2)))
+    else:
+        candidates = itertools.chain((base,), (f"{base} ({n})" for n in itertools.count(2)))
+    with _titles_lock:
+        for stem in candidates:
+            if not _title_taken(stem, video_id):
+                _reserved_titles.add(stem)
+                return stem
+
+def hold_safe_title(stem):
+    """Reserve a stem already chosen by an earlier run (a job resumed from the journal)."""
+    with _titles_lock:
+        _reserved_titles.add(stem)
+
+def release_safe_title(stem):
+    with _titles_lock:
+        _reserved_titles.discard(stem)
+
+def reserved_titles():
+    """File name stems of the downloads in flight in this process."""
+    with _titles_lock:
+        return set(_reserved_titles)
+
+def get_stream_url(info):
+    """Pick the audio stream URL used for preview playback."""
+    formats = info.get('formats', [])
+    # Try to get best audio-only format
+    for f in formats:
+        if f.get('acodec') != 'none' and f.get('vcodec') == 'none':
+            return f.get('url')
+    # Fallback to any format with audio
+    for f in formats:
+        if f.get('acodec') != 'none':
+            return f.get('url')
+    return None
+
+def refresh_stream_url(url):
+    """Resolve a playable stream URL, re-extracting only if the cached one has expired."""
+    return get_stream_url(resolve_info(url))
+
+def download_with_info(ydl, info, url):
+    """Download from an already resolved info dict instead of extracting the URL again.
+
+    Mirrors YoutubeDL.download_with_info_file: the info is sanitized and fed to
+    process_ie_result, and only if the stored format URLs have gone stale do we
+    fall back to a fresh extraction of the webpage URL. Returns the processed
+    info dict, whose 'requested_downloads' hold the downloaded file paths.
+    """
+    try:
+        return ydl.process_ie_result(ydl.sanitize_info(info, remove_private_keys=True), download=True)
+    except (DownloadError, ReExtractInfo) as e:
+        webpage_url = info.get('webpage_url') or url
+        print(f"Resolved info failed to download ({e}); re-extracting {webpage_url}")
+        record_retry("network_fetch")
+        _count_extraction(url)
+        return _extract_info(ydl, webpage_url, download=True)
+
+def get_best_thumbnail_url(info):
+    """Pick the highest resolution thumbnail URL from an info dict."""
+    thumbnails = info.get('thumbnails', [])
+    if thumbnails:
+        # Sort by resolution (prefer maxresdefault)
+        sorted_thumbs = sorted(thumbnails, key=lambda x: (x.get('width') or 0) * (x.get('height') or 0), reverse=True)
+        return sorted_thumbs[0].get('url') or info.get('thumbnail')
+    return info.get('thumbnail')
+
+def download_thumbnail(thumb_url, save_path):
+    """Download thumbnail image and save it to file as 500x500 cover art."""
+    cover = get_cover_bytes(thumb_url)
+    if cover is None:
         return None
+    with open(save_path, 'wb') as f:
+        f.write(cover)
+    return save_path
 
-def extract_video_info(url):
-    """Extract video metadata including thumbnail, title, author, and stream URL."""
-    ydl_opts = get_ydl_opts()
-    with YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=False)
-        
-        # Get thumbnail - try to get highest quality
-        thumb_url = None
-        thumbnails = info.get('thumbnails', [])
-        if thumbnails:
-            # Sort by resolution (prefer maxresdefault)
-            sorted_thumbs = sorted(thumbnails, key=lambda x: x.get('width', 0) * x.get('height', 0), reverse=True)
-            thumb_url = sorted_thumbs[0].get('url') if sorted_thumbs else info.get('thumbnail')
-        else:
-            thumb_url = info.get('thumbnail')
-        
-        img = None
-        if thumb_url:
-            try:
-                response = requests.get(thumb_url, timeout=10)
-                img = Image.open(BytesIO(response.content))
-                img.thumbnail((338, 190), Image.LANCZOS)  # 16:9 aspect ratio for preview
-            except Exception as e:
-                print(f"Thumbnail fetch error: {e}")
-        
-        # Get audio stream URL
-        stream_url = None
-        formats = info.get('formats', [])
-        # Try to get best audio-only format
-        for f in formats:
-            if f.get('acodec') != 'none' and f.get('vcodec') == 'none':
-                stream_url = f.get('url')
-                break
-        # Fallback to any format with audio
-        if not stream_url:
-            for f in formats:
-                if f.get('acodec') != 'none':
-                    stream_url = f.get('url')
-                    break
-        
-        return {
-            'thumbnail': img,
-            'thumbnail_url': thumb_url,
-            'title': info.get('title', ''),
-            'author': info.get('uploader', '') or info.get('channel', ''),
-            'album': info.get('album', '') or info.get('title', ''),  # Use track title as album fallback
-            'stream_url': stream_url
-        }
+def extract_video_info(url, info=None):
+    """Extract video metadata including thumbnail, title, author, and stream URL.
+
+    The raw yt-dlp info dict is returned under 'info' so the download step can
+    reuse it instead of resolving the URL again. A recently seen URL is served
+    from the info cache; if its stream URL has expired, 'stream_url' is None and
+    refresh_stream_url() fetches a new one when playback is requested.
+    """
+    fresh = True
+    if info is None:
+        info, fresh = get_cached_info(url)
+        if info is None:
+            info = resolve_info(url, use_cache=False)
+            fresh = True
+
+    # Get thumbnail - try to get highest quality
+    thumb_url = get_best_thumbnail_url(info)
+
+    img = get_preview_image(thumb_url) if thumb_url else None
+
+    # Get audio stream URL
+    stream_url = get_stream_url(info) if fresh else None
+
+    return {
+        'thumbnail': img,
+        'thumbnail_url': thumb_url,
+        'title': info.get('title', ''),
+        'author': info.get('uploader', '') or info.get('channel', ''),
+        'album': info.get('album', '') or info.get('title', ''),  # Use track title as album fallback
+        'stream_url': stream_url,
+        'info': info,
+    }
 
 
 # Keep old function name for backward compatibility
@@ -146,84 +315,442 @@ def extract_thumbnail(url):
     info = extract_video_info(url)
     return info.get('thumbnail')
 
-def download_audio(url, custom_title=None, custom_author=None, custom_genre=None):
-    """Download audio from YouTube with full metadata and cover art."""
-    temp_cover = None
+# Output modes: which stream to fetch and what FFmpegExtractAudioPP turns it into.
+# 'native' keeps the source codec and only remuxes it (-c copy) into .opus/.m4a;
+# 'opus' and 'm4a' prefer a source in that codec and only encode when it differs;
+# 'mp3' always encodes. 'encoder' is the ffmpeg encoder an encode would need.
+OUTPUT_MODES = {
+    'mp3': {'format': 'bestaudio/best', 'codec': 'mp3', 'quality': '320', 'encoder': 'libmp3lame'},
+    'native': {'format': 'bestaudio/best', 'codec': 'best', 'quality': None, 'encoder': None},
+    'opus': {'format': 'bestaudio[acodec=opus]/bestaudio/best', 'codec': 'opus', 'quality': '160', 'encoder': 'libopus'},
+    'm4a': {'format': 'bestaudio[ext=m4a]/bestaudio/best', 'codec': 'm4a', 'quality': '160', 'encoder': 'aac'},
+}
+
+def get_output_mode(mode=None):
+    mode = mode or AUDIO_OUTPUT_MODE
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode '{mode}', expected one of: {', '.join(OUTPUT_MODES)}")
+    return mode
+
+def needs_encode(acodec, mode):
+    """True if converting a stream in acodec to the output mode means a real encode, not a remux."""
+    acodec = (acodec or '').lower()
+    codec = OUTPUT_MODES[mode]['codec']
+    if codec == 'best':
+        return False
+    if codec == 'm4a':
+        return not acodec.startswith(('mp4a', 'aac'))
+    return acodec != codec
+
+def select_format_id(info, output_mode):
+    """Run yt-dlp's format selection for the output mode ahead of the download."""
+    with timed("format_select"), YoutubeDL(get_ydl_opts()) as ydl:
+        selector = ydl.build_format_selector(OUTPUT_MODES[output_mode]['format'])
+        selected = ydl._select_formats(info.get('formats') or [], selector)
+    return selected[0].get('format_id') if selected else None
+
+
+class Prefetcher:
+    """Speculatively warms a URL's info, cover art and format choice before Download is pressed.
+
+    Only the most recently requested URL is worked on: prefetching a new URL
+    cancels the previous one. At most PREFETCH_MAX_ENTRIES warmed entries are
+    kept, with their info dicts trimmed, so memory stays bounded.
+    """
+
+    def __init__(self, max_entries=PREFETCH_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="0music-prefetch")
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._cancel = threading.Event()
+
+    def prefetch(self, url, output_mode=None):
+        output_mode = get_output_mode(output_mode)
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry and entry['output_mode'] == output_mode and not entry['future'].cancelled():
+                self._entries.move_to_end(url)
+                return entry['future']
+            # The URL changed: stop warming the previous one
+            self._cancel.set()
+            self._cancel = threading.Event()
+            entry = {'output_mode': output_mode, 'elapsed': 0.0, 'started': time.perf_counter()}
+            entry['future'] = self._pool.submit(self._warm, url, entry, self._cancel)
+            self._entries[url] = entry
+            while len(self._entries) > self.max_entries:
+                _, old = self._entries.popitem(last=False)
+                old['future'].cancel()
+        return entry['future']
+
+    def cancel(self):
+        """Abandon the in-progress prefetch, e.g. when the URL entry is cleared."""
+        with self._lock:
+            self._cancel.set()
+            self._cancel = threading.Event()
+
+    def take(self, url, output_mode, wait=True):
+        """Hand the warmed state for url to the download, or None if there is none.
+
+        A prefetch still running is waited for (unless wait is False), since it
+        is doing exactly the work the download would otherwise start from scratch.
+        """
+        with self._lock:
+            entry = self._entries.pop(url, None)
+        if entry is None or entry['output_mode'] != output_mode or entry['future'].cancelled():
+            return None
+        if not wait and not entry['future'].done():
+            return None
+        taken_at = time.perf_counter()
+        try:
+            warmed = entry['future'].result()
+        except Exception as e:
+            print(f"Prefetch of {url} failed, downloading cold: {e}")
+            return None
+        if warmed is None:
+            return None
+        # Work finished before the download asked for it is wall-clock time saved;
+        # a prefetch that was still running only saved the part already done
+        warmed['saved'] = max(0.0, min(entry['elapsed'], taken_at - entry['started']))
+        return warmed
+
+    def _warm(self, url, entry, cancel):
+        started = entry['started'] = time.perf_counter()
+        if cancel.is_set():
+            return None
+        info = trim_info(resolve_info(url))
+        if cancel.is_set():
+            return None
+        format_id = select_format_id(info, entry['output_mode'])
+        thumb_url = get_best_thumbnail_url(info)
+        if thumb_url and not cancel.is_set():
+            get_cover_bytes(thumb_url)  # lands in the artwork cache
+        entry['elapsed'] = time.perf_counter() - started
+        return {'info': info, 'format_id': format_id}
+
+
+_prefetcher = Prefetcher()
+
+def prefetch(url, output_mode=None):
+    """Start warming url in the background; download_audio picks the result up."""
+    return _prefetcher.prefetch(url, output_mode)
+
+def cancel_prefetch():
+    _prefetcher.cancel()
+
+def fetch_audio(url, custom_title=None, custom_author=None, custom_genre=None, info=None, output_mode=None,
+                progress=None, connections=None):
+    """Network stage: download the best audio stream as-is, without any ffmpeg work.
+
+    State warmed by prefetch(url) is used when available. Returns a track dict
+    that transcode_audio and finalize_track carry forward. progress is a
+    TrackProgress fed by the yt-dlp hooks; one without a callback is made if omitted.
+    connections (default DOWNLOAD_CONNECTIONS) is how many byte ranges of a
+    progressive stream, or fragments of a DASH stream, are fetched at once.
+    """
+    progress = progress or TrackProgress(url)
+    connections = max(1, DOWNLOAD_CONNECTIONS if connections is None else connections)
+    output_mode = get_output_mode(output_mode)
+    format_spec = OUTPUT_MODES[output_mode]['format']
+    prefetch_saved = 0.0
+    # With info already in hand there is no point waiting for a prefetch still running
+    warmed = _prefetcher.take(url, output_mode, wait=info is None)
+    if warmed:
+        info = info or warmed['info']
+        prefetch_saved = warmed['saved']
+        # Try the pre-selected format first, the normal selection is the fallback
+        if warmed.get('format_id'):
+            format_spec = f"{warmed['format_id']}/{format_spec}"
+    if info is None or not is_info_fresh(info):
+        progress.enter(RESOLVING)
+        info = resolve_info(url)
+
+    # Get metadata
+    display_title = custom_title or info.get('title', 'Unknown Title')
+    display_author = custom_author or info.get('uploader', '') or info.get('channel', 'Unknown Artist')
+    album = info.get('album', '') or display_title  # Use title as album if not available
+    genre = custom_genre or info.get('genre') or None
+
+    video_id = canonical_video_id(url, info)
+    ensure_dirs()
+    # Held until finalize_track (or release_safe_title after a failure), so no other download picks the name
+    safe_title = reserve_safe_title(display_title, video_id)
+    ydl_opts = get_ydl_opts()
+    ydl_opts.update({
+        'format': format_spec,
+        'outtmpl': f"{OUTPUT_DIR}/{safe_title}.%(ext)s",
+        'progress_hooks': [progress.download_hook],
+        'concurrent_fragment_downloads': connections,
+        # A .part left by an interrupted run is resumed with a Range request; a complete file is not fetched again
+        'continuedl': True,
+    })
+
+    def download():
+        # A retry picks up the .part file (or the finished ranges) of the failed attempt
+        with timed("network_fetch"), RangedYoutubeDL(ydl_opts, connections=connections) as ydl:
+            return download_with_info(ydl, info, url)
+
+    try:
+        progress.enter(DOWNLOADING)
+        result = _scheduler.run(url, "network_fetch", download)
+
+        # The downloaded format carries filepath/ext; merge it over the video-level fields
+        downloads = result.get('requested_downloads') or [{}]
+        downloaded = {**result, **downloads[0]}
+        if not downloaded.get('filepath'):
+            raise RuntimeError(f"Download produced no file for {url}")
+    except BaseException:
+        release_safe_title(safe_title)
+        raise
+
+    return {
+        'url': url,
+        'info': downloaded,
+        'title': display_title,
+        'author': display_author,
+        'album': album,
+        'genre': genre,
+        'thumb_url': get_best_thumbnail_url(info),
+        'safe_title': safe_title,
+        'filepath': downloaded['filepath'],
+        'output_mode': output_mode,
+        'video_id': video_id,
+        'prefetch_saved': prefetch_saved,
+        'progress': progress,
+    }
+
+# Track fields kept in the job journal, enough to transcode/finalize after a restart
+SNAPSHOT_KEYS = ('url', 'title', 'author', 'album', 'genre', 'thumb_url', 'safe_title', 'filepath', 'output_mode',
+                 'video_id')
+
+def track_snapshot(track):
+    """JSON-able subset of a track dict for the job journal."""
+    snapshot = {key: track.get(key) for key in SNAPSHOT_KEYS}
+    snapshot['ext'] = track['info'].get('ext')
+    snapshot['acodec'] = track['info'].get('acodec')
+    return snapshot
+
+def track_from_snapshot(snapshot, progress=None):
+    """Rebuild a track dict from track_snapshot output, for a job resumed after a restart."""
+    track = {key: snapshot.get(key) for key in SNAPSHOT_KEYS}
+    track['info'] = {
+        'filepath': snapshot['filepath'],
+        'ext': snapshot.get('ext'),
+        'acodec': snapshot.get('acodec'),
+        'webpage_url': snapshot['url'],
+    }
+    track['prefetch_saved'] = 0.0
+    track['progress'] = progress or TrackProgress(snapshot['url'])
+    return track
+
+def embed_plan(acodec, output_mode):
+    """(extension, ffmpeg audio args) for a single-pass convert+tag, or None if unsupported.
+
+    ffmpeg can attach cover art for MP3 (ID3 APIC) and M4A (covr) but not for
+    Ogg/Opus, so Opus output keeps tagging with mutagen afterwards.
+    """
+    acodec = (acodec or '').lower()
+    is_aac = acodec.startswith(('mp4a', 'aac'))
+    if output_mode == 'mp3' or (output_mode == 'native' and acodec == 'mp3'):
+        return 'mp3', ['-c:a', 'copy'] if acodec == 'mp3' else ['-c:a', 'libmp3lame', '-b:a', '320k']
+    if output_mode == 'm4a' or (output_mode == 'native' and is_aac):
+        return 'm4a', ['-c:a', 'copy'] if is_aac else ['-c:a', 'aac', '-b:a', '160k']
+    return None
+
+def transcode_and_tag(track, cover_data):
+    """Convert and write tags + cover art in one ffmpeg run, so the audio bytes are written once.
+
+    Returns False when the output format can't carry embedded art, in which
+    case the caller falls back to transcode_audio and mutagen tagging.
+    """
+    plan = embed_plan(track['info'].get('acodec'), track['output_mode'])
+    if plan is None:
+        return False
+    ext, codec_args = plan
+
+    source = track['filepath']
+    # A track may name its own output folder (bench_transcode keeps its files in a temp dir)
+    out_dir = track.get('out_dir') or get_staging_dir()
+    final_path = os.path.join(out_dir, f"{track['safe_title']}.{ext}")
+    temp_path = os.path.join(out_dir, f"{track['safe_title']}.temp.{ext}")
+
+    cmd = [get_toolchain().ffmpeg, '-y', '-loglevel', 'error', '-i', source]
+    if cover_data:
+        # The cover is piped in on stdin, no temp file needed
+        cmd += ['-f', 'jpeg_pipe', '-i', 'pipe:0']
+    cmd += ['-map', '0:a:0']
+    if cover_data:
+        cmd += ['-map', '1:v:0', '-c:v', 'copy', '-disposition:v:0', 'attached_pic',
+                '-metadata:s:v', 'title=Album cover', '-metadata:s:v', 'comment=Cover (front)']
+    cmd += codec_args
+    tags = {
+        'title': track['title'] or "Unknown Title",
+        'artist': track['author'] or "Unknown Artist",
+        'album': track['album'] or "Unknown Album",
+        'genre': track['genre'],
+    }
+    for key, value in tags.items():
+        if value:
+            cmd += ['-metadata', f"{key}={value}"]
+    if ext == 'mp3':
+        cmd += ['-id3v2_version', '3', '-metadata_header_padding', str(ID3_PADDING)]
+    cmd.append(temp_path)
+
     try:
-        info_opts = get_ydl_opts()
-        with YoutubeDL(info_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-
-        # Get metadata
-        display_title = custom_title or info.get('title', 'Unknown Title')
-        display_author = custom_author or info.get('uploader', '') or info.get('channel', 'Unknown Artist')
-        album = info.get('album', '') or display_title  # Use title as album if not available
-        genre = custom_genre or info.get('genre') or None
-        
-        # Get best thumbnail URL
-        thumb_url = None
-        thumbnails = info.get('thumbnails', [])
-        if thumbnails:
-            sorted_thumbs = sorted(thumbnails, key=lambda x: x.get('width', 0) * x.get('height', 0), reverse=True)
-            thumb_url = sorted_thumbs[0].get('url') if sorted_thumbs else info.get('thumbnail')
-        else:
-            thumb_url = info.get('thumbnail')
-        
-        safe_title = sanitize_filename(display_title)
-
-        outtmpl = f"{OUTPUT_DIR}/{safe_title}.%(ext)s"
-
-        ydl_opts = get_ydl_opts()
-        ydl_opts.update({
-            'format': 'bestaudio/best',
-            'outtmpl': outtmpl,
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '320',  # Higher quality
-            }],
-        })
-
-        with YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-
-        filename = f"{safe_title}.mp3"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-
-
-        # Download and embed cover art (always apply metadata before moving)
-        if thumb_url:
-            temp_cover = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False).name
-            cover_path = download_thumbnail(thumb_url, temp_cover)
-            if cover_path and os.path.exists(filepath):
-                apply_metadata(filepath, display_title, display_author, album, cover_path, genre)
-        else:
-            # Apply metadata without cover
-            if os.path.exists(filepath):
-                apply_metadata(filepath, display_title, display_author, album, None, genre)
-
-        # If Music auto-import exists, move the file there after all processing
-        from .config import MUSIC_AUTO_ADD, MUSIC_AUTO_ADD_EXISTS
-        finalpath = filepath
-        if MUSIC_AUTO_ADD_EXISTS:
-            import shutil
-            dest = os.path.join(MUSIC_AUTO_ADD, filename)
-            try:
+        with timed("ffmpeg"):
+            subprocess.run(cmd, input=cover_data, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise RuntimeError(f"ffmpeg failed: {e.stderr.decode('utf-8', 'replace').strip()}") from e
+
+    os.replace(temp_path, final_path)
+    if os.path.abspath(source) != os.path.abspath(final_path):
+        os.remove(source)
+    track['filepath'] = final_path
+    track['info']['filepath'] = final_path
+    track['info']['ext'] = ext
+    track['tags_embedded'] = True
+    return True
+
+def get_staging_dir():
+    """Where converted files are written before they reach their final folder.
+
+    When the Music auto-import folder lives on another volume than OUTPUT_DIR,
+    a staging folder beside it turns the final move into a rename instead of a
+    copy. Anything unusable (unwritable, gone) falls back to OUTPUT_DIR.
+    """
+    from .config import MUSIC_AUTO_ADD, MUSIC_AUTO_ADD_EXISTS, STAGING_DIR, STAGING_DIR_NAME
+    staging = STAGING_DIR
+    if not staging and MUSIC_AUTO_ADD_EXISTS:
+        try:
+            if os.stat(MUSIC_AUTO_ADD).st_dev != os.stat(OUTPUT_DIR).st_dev:
+                staging = os.path.join(os.path.dirname(os.path.abspath(MUSIC_AUTO_ADD)), STAGING_DIR_NAME)
+        except OSError:
+            pass
+    if staging:
+        try:
+            os.makedirs(staging, exist_ok=True)
+            if os.access(staging, os.W_OK):
+                return staging
+        except OSError as e:
+            print(f"Warning: staging in {OUTPUT_DIR}, could not use {staging}: {e}")
+    return OUTPUT_DIR
+
+def transcode_audio(track):
+    """CPU stage: bring the downloaded stream into the track's output mode with ffmpeg.
+
+    Streams already in the target codec are remuxed with -c copy; only a codec
+    change costs a full decode and encode. With EMBED_TAGS_IN_FFMPEG the tags
+    and cover art are written in the same ffmpeg run where the format allows it.
+    """
+    progress = track['progress']
+    progress.enter(TRANSCODING)
+    if EMBED_TAGS_IN_FFMPEG:
+        cover_data = get_cover_bytes(track['thumb_url']) if track.get('thumb_url') else None
+        if transcode_and_tag(track, cover_data):
+            return track
+
+    mode = OUTPUT_MODES[track['output_mode']]
+    encoder = mode['encoder']
+    if encoder and needs_encode(track['info'].get('acodec'), track['output_mode']):
+        toolchain = get_toolchain()
+        if toolchain and toolchain.encoders and not toolchain.has_encoder(encoder):
+            raise RuntimeError(f"ffmpeg {toolchain.version} has no {encoder} encoder, needed for {track['output_mode']} output")
+
+    ydl_opts = get_ydl_opts()
+    ydl_opts['postprocessor_hooks'] = [progress.postprocessor_hook]
+    with YoutubeDL(ydl_opts) as ydl:
+        pp = FFmpegExtractAudioPP(ydl, preferredcodec=mode['codec'], preferredquality=mode['quality'])
+        with timed("ffmpeg"):
+            track['info'] = ydl.run_pp(pp, track['info'])
+    track['filepath'] = track['info']['filepath']
+    return track
+
+def finalize_track(track):
+    """Embed tags and cover art, move into the Music library and record the song."""
+    progress = track['progress']
+    progress.enter(TAGGING)
+    filepath = track['filepath']
+    filename = os.path.basename(filepath)
+    thumb_url = track['thumb_url']
+
+    # Embed cover art straight from the artwork cache (always apply metadata before moving),
+    # unless transcode_and_tag already wrote it during the ffmpeg pass
+    if not track.get('tags_embedded') and os.path.exists(filepath):
+        cover_data = get_cover_bytes(thumb_url) if thumb_url else None
+        apply_metadata(filepath, track['title'], track['author'], track['album'], genre=track['genre'], cover_data=cover_data)
+
+    # If Music auto-import exists, move the file there after all processing
+    import shutil
+    from .config import MUSIC_AUTO_ADD, MUSIC_AUTO_ADD_EXISTS
+    finalpath = filepath
+    if MUSIC_AUTO_ADD_EXISTS:
+        dest = os.path.join(MUSIC_AUTO_ADD, filename)
+        try:
+            with timed("file_move"):
                 shutil.move(filepath, dest)
-                finalpath = dest
-            except Exception as move_err:
-                print(f"Warning: Could not move to Music auto-import folder: {move_err}")
+            finalpath = dest
+        except Exception as move_err:
+            print(f"Warning: Could not move to Music auto-import folder: {move_err}")
+    if finalpath == filepath and os.path.dirname(os.path.abspath(filepath)) != os.path.abspath(OUTPUT_DIR):
+        # Still in the staging folder: bring it back to OUTPUT_DIR, where the library scan can see it
+        try:
+            finalpath = shutil.move(filepath, os.path.join(OUTPUT_DIR, filename))
+        except Exception as move_err:
+            print(f"Warning: Could not move {filepath} out of the staging folder: {move_err}")
+    track['filepath'] = finalpath
+
+    with timed("db_insert"):
+        add_song(track['title'], filename, track['author'], track['genre'], datetime.now(), track['url'],
+                 video_id=track.get('video_id'), path=os.path.abspath(finalpath))
+    # The song row and the file now claim the name
+    release_safe_title(track['safe_title'])
+    progress.finish()
+    saved = track.get('prefetch_saved')
+    saved_note = f", prefetch saved {saved:.2f}s" if saved else ""
+    phases = ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in progress.phase_durations.items())
+    print(f"Downloaded '{track['title']}' using {get_extraction_count(track['url'])} extraction(s){saved_note} ({phases})")
+    return track['title']
+
+def download_audio(url, custom_title=None, custom_author=None, custom_genre=None, info=None, output_mode=None,
+                   on_progress=None, force=None, connections=None):
+    """Download audio from YouTube with full metadata and cover art.
 
-        add_song(display_title, filename, display_author, genre, datetime.now(), url)
-        return display_title
-        
+    Pass the info dict from a previous extract_video_info/resolve_info call to
+    skip resolving the URL again. output_mode is one of OUTPUT_MODES and
+    defaults to AUDIO_OUTPUT_MODE from the config. on_progress(event) receives
+    the progress events described in settings/progress.py. connections sets the
+    parallel ranged download (see fetch_audio). Runs the fetch, transcode and finalize stages
+    back to back; DownloadQueue in settings/jobs.py runs them on separate pools.
+
+    A video already in the library returns its title straight away, unless
+    force (default: DEDUP_POLICY == "refresh") asks for a fresh download.
+    """
+    trace = Trace(url)
+    track = None
+    try:
+        with trace.active():
+            if not dedup_force(force):
+                video_id = canonical_video_id(url)
+                if video_id is None:
+                    # Only non-YouTube URLs need resolving to know their id; fetch_audio reuses the info
+                    info = info or resolve_info(url)
+                    video_id = canonical_video_id(url, info)
+                song = find_song(video_id) if video_id else None
+                if song:
+                    print(f"Already have '{song[1]}' ({video_id}), skipping download")
+                    trace.finish()
+                    return song[1]
+            track = fetch_audio(url, custom_title, custom_author, custom_genre, info=info, output_mode=output_mode,
+                                progress=TrackProgress(url, on_progress), connections=connections)
+            transcode_audio(track)
+            title = finalize_track(track)
+        trace.finish()
+        return title
     except Exception as e:
+        if track:
+            release_safe_title(track['safe_title'])
+        trace.finish(e)
         print(f"Error occurred during download: {e}")
         raise e
-    finally:
-        # Clean up temp cover file
-        if temp_cover and os.path.exists(temp_cover):
-            try:
-                os.remove(temp_cover)
-            except:
-                pass
\ No newline at end of file
@@ -1,21 +1,21 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk, ImageDraw
+import importlib.util
 import threading
 import webbrowser
 import os
 import sys
-from .utils import clear_placeholder, restore_placeholder
-from .config import OUTPUT_DIR
-from .database import init_db, get_all_songs
-from .downloader import download_audio, extract_video_info
-
-# Try to import VLC
-try:
-    import vlc
-    VLC_AVAILABLE = True
-except ImportError:
-    VLC_AVAILABLE = False
+from .utils import clear_placeholder, restore_placeholder, extract_video_id
+from .config import OUTPUT_DIR, LIBRARY_SCAN_ON_STARTUP
+from .database import init_db, subscribe_changes, close_db
+from .song_list import VirtualSongList
+
+# yt-dlp, requests, mutagen, PIL and VLC are imported on first use (or by the
+# warm-up thread) so the window can paint before they load.
+
+# VLC is only looked up here; it is imported when preview is first pressed
+VLC_AVAILABLE = importlib.util.find_spec("vlc") is not None
+if not VLC_AVAILABLE:
     print("Warning: python-vlc not installed. Audio preview disabled.")
 
 def get_resource_path(relative_path):
@@ -43,22 +43,17 @@ class MusicDownloaderApp:
         self.vlc_player = None
         self.is_playing = False
         self.current_stream_url = None
-        
-        if VLC_AVAILABLE:
-            self.vlc_instance = vlc.Instance('--no-xlib', '--quiet')
-            self.vlc_player = self.vlc_instance.media_player_new()
 
-        # Load default logo
+        # Resolved yt-dlp info for the URL in the entry, reused by the download
+        self.current_info = None
+        self.current_info_url = None
+
+        # Debounced, coalesced preview lookups; preview_url is the URL being shown
+        self._preview = None
+        self.preview_url = None
+
+        # Decoded after the first paint, see finish_startup
         self.default_logo_image = None
-        try:
-            logo_path = get_resource_path("assets/logo.png")
-            original_logo = Image.open(logo_path)
-            resized_logo = original_logo.resize((338, 190), Image.LANCZOS)
-            self.default_logo_image = ImageTk.PhotoImage(resized_logo)
-        except FileNotFoundError:
-            print(f"Warning: assets/logo.png not found at {logo_path}")
-        except Exception as e:
-            print(f"Error loading default logo: {e}")
 
         self.font = "Segoe UI"
         self.colors = {
@@ -82,21 +77,31 @@ class MusicDownloaderApp:
                         thickness=12,
                         borderwidth=0)
 
-        init_db()
+        # Background download queue, created on first use; job updates are marshalled onto the Tk thread
+        self._download_queue = None
+        self.batch_done = []
+        self.batch_skipped = []
+        self.batch_failed = []
+        # Jobs with a higher id belong to the batch the progress bar is showing
+        self.batch_after_id = 0
+        self.playlists_ingesting = 0
+        # Worker threads still submitting pasted URLs (submit does database work, so not on the Tk thread)
+        self.urls_submitting = 0
+
         self.thumbnail_image = None
         self.current_thumbnail_image = None
-        
-        # Create play/pause icons
-        self.play_icon_image = self.create_play_icon(60)
-        self.pause_icon_image = self.create_pause_icon(60)
+
+        # Play/pause icons are drawn in finish_startup; the button stays hidden until a preview loads
+        self.play_icon_image = None
+        self.pause_icon_image = None
 
         # Store placeholders for validation
         self.url_placeholder = "https://youtu.be/example"
         self.title_placeholder = "e.g. My Song"
         self.author_placeholder = "e.g. Artist"
         
-        # Song list data
-        self.all_songs = []
+        # Song list is windowed; rows are fetched from SQLite as they scroll into view
+        self.song_list = None
 
         self.genre_options = [
             "Pop", "Rock", "Hip-Hop", "Jazz", "Classical", "Electronic", "Country", "R&B", "Reggae", "Blues", "Other"
@@ -106,8 +111,96 @@ class MusicDownloaderApp:
         # Bind cleanup on window close
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+        # Let the window map and paint before anything slow runs
+        self.root.after_idle(self.root.after, 0, self.finish_startup)
+
+    def finish_startup(self):
+        """Deferred startup work: logo, icons, the first song list page and the warm-up thread."""
+        self.load_default_logo()
+        self.play_icon_image = self.create_play_icon(60)
+        self.pause_icon_image = self.create_pause_icon(60)
+        self.play_button.config(image=self.play_icon_image)
+        self.song_list.set_query(self.search_var.get())
+        threading.Thread(target=self.warm_up, daemon=True).start()
+
+    def warm_up(self):
+        """Import the download stack in the background so the first URL does not pay for it."""
+        try:
+            from . import downloader, jobs, playlist, preview  # noqa: F401
+            init_db()
+        except Exception as e:
+            print(f"Warm-up error: {e}")
+            return
+        self.root.after(0, self.resume_downloads)
+        if LIBRARY_SCAN_ON_STARTUP:
+            # Still on the warm-up thread: index files added, changed or removed while the app was closed
+            from .library_scan import reconcile_library
+            try:
+                reconcile_library()
+            except Exception as e:
+                print(f"Library scan error: {e}")
+
+    def resume_downloads(self):
+        """Pick up downloads that were still running when the app last closed or crashed."""
+        try:
+            resumed = self.download_queue.resume()
+        except Exception as e:
+            print(f"Resume error: {e}")
+            return
+        if resumed:
+            self.download_progress.pack(pady=(5, 0), fill="x")
+            self.update_download_status()
+
+    def load_default_logo(self):
+        from PIL import Image, ImageTk
+        try:
+            logo_path = get_resource_path("assets/logo.png")
+            original_logo = Image.open(logo_path)
+            resized_logo = original_logo.resize((338, 190), Image.LANCZOS)
+            self.default_logo_image = ImageTk.PhotoImage(resized_logo)
+        except FileNotFoundError:
+            print(f"Warning: assets/logo.png not found at {logo_path}")
+            return
+        except Exception as e:
+            print(f"Error loading default logo: {e}")
+            return
+        # Only show it if no preview has replaced the placeholder yet
+        if self.preview_url is None:
+            self.thumbnail_label.config(image=self.default_logo_image)
+            self.current_thumbnail_image = self.default_logo_image
+
+    @property
+    def preview(self):
+        if self._preview is None:
+            from .preview import PreviewService
+            self._preview = PreviewService()
+        return self._preview
+
+    @property
+    def download_queue(self):
+        if self._download_queue is None:
+            from .jobs import DownloadQueue
+            self._download_queue = DownloadQueue()
+            self._download_queue.subscribe(lambda job: self.root.after(0, self.on_job_update, job))
+            self._download_queue.subscribe_progress(lambda job, event: self.root.after(0, self.update_download_status))
+        return self._download_queue
+
+    def get_vlc_player(self):
+        """VLC is imported and its instance created the first time preview is pressed."""
+        global VLC_AVAILABLE
+        if self.vlc_player is None and VLC_AVAILABLE:
+            try:
+                import vlc
+                self.vlc_instance = vlc.Instance('--no-xlib', '--quiet')
+                self.vlc_player = self.vlc_instance.media_player_new()
+            except Exception as e:
+                VLC_AVAILABLE = False
+                print(f"Warning: VLC could not be started ({e}). Audio preview disabled.")
+        return self.vlc_player
+
     def create_play_icon(self, size):
         """Create a play triangle icon."""
+        from PIL import Image, ImageTk, ImageDraw
         img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
         draw = ImageDraw.Draw(img)
         padding = 5
@@ -123,6 +216,7 @@ class MusicDownloaderApp:
 
     def create_pause_icon(self, size):
         """Create a pause icon with two bars."""
+        from PIL import Image, ImageTk, ImageDraw
         img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
         draw = ImageDraw.Draw(img)
         padding = 5
@@ -158,12 +252,8 @@ class MusicDownloaderApp:
         self.thumbnail_label = tk.Label(frame, bg=self.colors["bg"])
         self.thumbnail_label.pack(expand=True, fill="both")
 
-        if self.default_logo_image:
-            self.thumbnail_label.config(image=self.default_logo_image)
-            self.current_thumbnail_image = self.default_logo_image
-
         self.play_button = tk.Button(
-            frame, image=self.play_icon_image, command=self.toggle_playback,
+            frame, command=self.toggle_playback,
             bg=self.colors["bg"], border=0, highlightthickness=0, relief="flat", cursor="hand2",
             activebackground=self.colors["bg"]
         )
@@ -222,7 +312,8 @@ class MusicDownloaderApp:
 
         self.download_progress = ttk.Progressbar(
             self.download_frame, 
-            mode="indeterminate",
+            mode="determinate",
+            maximum=100,
             style="TProgressbar",
             length=308
         )
@@ -294,34 +385,29 @@ class MusicDownloaderApp:
         style.map("Treeview.Heading",
                   background=[("active", "#1AA34A")])
 
-        scrollbar = ttk.Scrollbar(listbox_frame, orient=tk.VERTICAL, command=self.song_list_tree.yview)
-        self.song_list_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(listbox_frame, orient=tk.VERTICAL)
 
         scrollbar.pack(side="right", fill="y")
         self.song_list_tree.pack(side="left", fill="both", expand=True)
 
-        self.refresh_song_list()
+        # First page is loaded in finish_startup, after the window has painted
+        self.song_list = VirtualSongList(self.song_list_tree, scrollbar)
 
-    def refresh_song_list(self):
-        for item in self.song_list_tree.get_children():
-            self.song_list_tree.delete(item)
+        # Completed downloads append their row instead of reloading the list
+        subscribe_changes(lambda kind, song_id: self.root.after(0, self.on_library_change, kind, song_id))
 
-        self.all_songs = get_all_songs()
-        for song_id, title, author, *_ in self.all_songs:
-            self.song_list_tree.insert("", tk.END, values=(title or "Unknown", author or "Unknown"))
+    def refresh_song_list(self):
+        self.song_list.reload()
 
     def filter_song_list(self):
-        """Filter song list based on search query."""
-        query = self.search_var.get().lower().strip()
-        
-        for item in self.song_list_tree.get_children():
-            self.song_list_tree.delete(item)
-        
-        for song_id, title, author, *_ in self.all_songs:
-            title_str = title or "Unknown"
-            author_str = author or "Unknown"
-            if query in title_str.lower() or query in author_str.lower():
-                self.song_list_tree.insert("", tk.END, values=(title_str, author_str))
+        """Filter song list with a ranked full-text query against the database."""
+        self.song_list.set_query(self.search_var.get())
+
+    def on_library_change(self, kind, song_id):
+        if kind == 'insert':
+            self.song_list.on_song_added(song_id)
+        else:
+            self.song_list.reload()
 
     def get_entry_value(self, entry, placeholder):
         value = entry.get().strip()
@@ -333,7 +419,7 @@ class MusicDownloaderApp:
         entry.config(fg=self.colors["entry_fg"])
 
     def toggle_playback(self):
-        if not VLC_AVAILABLE:
+        if self.get_vlc_player() is None:
             url = self.get_entry_value(self.url_entry, self.url_placeholder)
             if url and ("youtube.com/watch?v=" in url or "youtu.be/" in url):
                 webbrowser.open(url)
@@ -341,17 +427,32 @@ class MusicDownloaderApp:
                 messagebox.showerror("Invalid URL", "Please enter a valid YouTube link.")
             return
 
-        if not self.current_stream_url:
-            messagebox.showinfo("Info", "Load a video first by entering a URL.")
-            return
-
         if self.is_playing:
             self.stop_playback()
-        else:
+        elif self.current_stream_url:
             self.start_playback()
+        elif self.current_info_url:
+            # Preview came from the info cache with an expired stream URL; refresh it now
+            threading.Thread(target=self.refresh_stream_and_play, args=(self.current_info_url,), daemon=True).start()
+        else:
+            messagebox.showinfo("Info", "Load a video first by entering a URL.")
+
+    def refresh_stream_and_play(self, url):
+        from .downloader import refresh_stream_url
+        try:
+            stream_url = refresh_stream_url(url)
+        except Exception as e:
+            print(f"Stream refresh error: {e}")
+            err_msg = str(e)
+            self.root.after(0, lambda msg=err_msg: messagebox.showerror("Playback Error", f"Could not play audio: {msg}"))
+            return
+        # Ignore the result if the user has moved on to another URL meanwhile
+        if url == self.current_info_url and stream_url:
+            self.current_stream_url = stream_url
+            self.root.after(0, self.start_playback)
 
     def start_playback(self):
-        if not VLC_AVAILABLE or not self.current_stream_url:
+        if self.get_vlc_player() is None or not self.current_stream_url:
             return
         
         try:
@@ -366,7 +467,8 @@ class MusicDownloaderApp:
             messagebox.showerror("Playback Error", f"Could not play audio: {err_msg}")
 
     def stop_playback(self):
-        if not VLC_AVAILABLE:
+        # Nothing can be playing before VLC has been started
+        if self.vlc_player is None:
             return
         
         try:
@@ -377,56 +479,80 @@ class MusicDownloaderApp:
             print(f"Stop error: {e}")
 
     def start_load_thumbnail_thread(self, event=None):
+        from .downloader import prefetch
+        from .playlist import is_playlist_url
         url = self.get_entry_value(self.url_entry, self.url_placeholder)
         if not url:
             self.clear_thumbnail()
             return
 
+        # Focus changes without editing the URL must not trigger another lookup
+        if url == self.preview_url:
+            return
+        self.preview_url = url
+
         self.stop_playback()
         self.current_stream_url = None
+        self.current_info = None
+        self.current_info_url = None
+
+        # Resolving a whole playlist for a preview would block for minutes
+        if is_playlist_url(url):
+            self.preview.cancel()
+            self.thumbnail_label.config(image="", text="Playlist: entries are queued on Download", fg=self.colors["muted"])
+            self.play_button.lower()
+            self.thumb_progress.stop()
+            self.thumb_progress.pack_forget()
+            return
+
+        # Warm info, cover art and format choice so Download can start transferring right away
+        if extract_video_id(url):
+            prefetch(url)
 
         self.thumbnail_label.config(image="", text="Loading...", fg=self.colors["muted"])
         self.play_button.lower()
 
         self.thumb_progress.pack(pady=(0, 5), padx=15, fill="x")
         self.thumb_progress.start(15)
-        threading.Thread(target=self.load_thumbnail, daemon=True).start()
+        self.preview.request(url, lambda u, info, error: self.root.after(0, self.on_preview_ready, u, info, error))
 
-    def load_thumbnail(self):
-        url = self.get_entry_value(self.url_entry, self.url_placeholder)
-        if not url:
-            self.root.after(0, self.clear_thumbnail)
+    def on_preview_ready(self, url, info, error):
+        # A newer URL was entered meanwhile; its own result will follow
+        if url != self.preview_url:
             return
 
-        try:
-            info = extract_video_info(url)
-            img = info.get('thumbnail')
-            title = info.get('title', '')
-            author = info.get('author', '')
-            stream_url = info.get('stream_url')
-            
-            self.current_stream_url = stream_url
-            
-            if img:
-                # Resize to fit preview area (338x190 for 16:9 aspect)
-                self.current_thumbnail_image = ImageTk.PhotoImage(img.resize((338, 190), Image.LANCZOS))
-                self.root.after(0, self.update_thumbnail_ui)
-            else:
-                self.root.after(0, lambda: self.thumbnail_label.config(image="", text="No thumbnail", fg=self.colors["muted"]))
-                self.root.after(0, self.play_button.lower)
-            
-            if title:
-                self.root.after(0, lambda t=title: self.set_entry_value(self.custom_title_entry, t))
-            if author:
-                self.root.after(0, lambda a=author: self.set_entry_value(self.custom_author_entry, a))
-                
-        except Exception as e:
-            err_msg = str(e)[:50]
-            self.root.after(0, lambda msg=err_msg: self.thumbnail_label.config(image="", text=f"Error: {msg}", fg=self.colors["error"]))
-            self.root.after(0, self.play_button.lower)
-        finally:
-            self.root.after(0, self.thumb_progress.stop)
-            self.root.after(0, self.thumb_progress.pack_forget)
+        self.thumb_progress.stop()
+        self.thumb_progress.pack_forget()
+
+        if error is not None:
+            # Let the next focus change retry this URL
+            self.preview_url = None
+            err_msg = str(error)[:50]
+            self.thumbnail_label.config(image="", text=f"Error: {err_msg}", fg=self.colors["error"])
+            self.play_button.lower()
+            return
+
+        img = info.get('thumbnail')
+        title = info.get('title', '')
+        author = info.get('author', '')
+
+        self.current_stream_url = info.get('stream_url')
+        self.current_info = info.get('info')
+        self.current_info_url = url
+
+        if img:
+            from PIL import Image, ImageTk
+            # Resize to fit preview area (338x190 for 16:9 aspect)
+            self.current_thumbnail_image = ImageTk.PhotoImage(img.resize((338, 190), Image.LANCZOS))
+            self.update_thumbnail_ui()
+        else:
+            self.thumbnail_label.config(image="", text="No thumbnail", fg=self.colors["muted"])
+            self.play_button.lower()
+
+        if title:
+            self.set_entry_value(self.custom_title_entry, title)
+        if author:
+            self.set_entry_value(self.custom_author_entry, author)
 
     def update_thumbnail_ui(self):
         self.thumbnail_label.config(image=self.current_thumbnail_image, text="")
@@ -435,6 +561,11 @@ class MusicDownloaderApp:
 
     def clear_thumbnail(self):
         self.stop_playback()
+        if self._preview is not None:
+            self.preview.cancel()
+            from .downloader import cancel_prefetch
+            cancel_prefetch()
+        self.preview_url = None
         self.current_stream_url = None
         
         if self.default_logo_image:
@@ -448,44 +579,136 @@ class MusicDownloaderApp:
         self.thumb_progress.pack_forget()
 
     def start_download_thread(self):
-        url = self.get_entry_value(self.url_entry, self.url_placeholder)
-        if not url:
+        from .playlist import is_playlist_url
+        urls = self.get_entry_value(self.url_entry, self.url_placeholder).split()
+        if not urls:
             messagebox.showwarning("Warning", "Please enter a YouTube URL.")
             return
 
         self.stop_playback()
 
-        self.download_button.config(state=tk.DISABLED, text="Downloading...")
-        self.download_progress.pack(pady=(5, 0), fill="x")
-        self.download_progress.start(15)
-        threading.Thread(target=self.download_audio_process, daemon=True).start()
+        title = self.get_entry_value(self.custom_title_entry, self.title_placeholder)
+        author = self.get_entry_value(self.custom_author_entry, self.author_placeholder)
+        genre = self.genre_var.get()
+
+        # Created here on the Tk thread; worker threads get it passed in
+        download_queue = self.download_queue
+        submissions = []
+        for url in urls:
+            if is_playlist_url(url):
+                self.playlists_ingesting += 1
+                threading.Thread(target=self.ingest_playlist, args=(download_queue, url, genre or None), daemon=True).start()
+            # Custom title/author only make sense for a single URL
+            elif len(urls) == 1:
+                # Reuse the info resolved for the preview if it belongs to this URL
+                info = self.current_info if self.current_info_url == url else None
+                submissions.append(((url, title or None, author or None, genre or None), {'info': info}))
+            else:
+                submissions.append(((url,), {'custom_genre': genre or None}))
+        if submissions:
+            self.urls_submitting += 1
+            threading.Thread(target=self.submit_urls, args=(download_queue, submissions), daemon=True).start()
 
-    def download_audio_process(self):
+        self.download_progress.pack(pady=(5, 0), fill="x")
+        self.update_download_status()
+
+    def submit_urls(self, download_queue, submissions):
+        for args, kwargs in submissions:
+            try:
+                download_queue.submit(*args, **kwargs)
+            except Exception as e:
+                print(f"Could not queue {args[0]}: {e}")
+                err_msg = str(e)
+                self.root.after(0, lambda msg=err_msg, url=args[0]: messagebox.showerror(
+                    "Download Error", f"Failed to queue {url}: {msg}"))
+        self.root.after(0, self.on_urls_submitted)
+
+    def on_urls_submitted(self):
+        self.urls_submitting -= 1
+        self.on_queue_maybe_drained()
+
+    def ingest_playlist(self, download_queue, url, genre):
+        from .playlist import enqueue_playlist
         try:
-            url = self.get_entry_value(self.url_entry, self.url_placeholder)
-            title = self.get_entry_value(self.custom_title_entry, self.title_placeholder)
-            author = self.get_entry_value(self.custom_author_entry, self.author_placeholder)
-            genre = self.genre_var.get()
-
-            if not url:
-                self.root.after(0, lambda: messagebox.showwarning("Warning", "Missing URL"))
-                return
-
-            song_title = download_audio(url, title or None, author or None, genre or None)
-            self.root.after(0, self.refresh_song_list)
-            self.root.after(0, lambda st=song_title: messagebox.showinfo("Downloaded", f"'{st}' has been saved."))
-
+            enqueue_playlist(download_queue, url, custom_genre=genre)
         except Exception as e:
-            print(f"Download error: {e}")
+            print(f"Playlist error: {e}")
             err_msg = str(e)
-            self.root.after(0, lambda msg=err_msg: messagebox.showerror("Download Error", f"Failed to download: {msg}"))
+            self.root.after(0, lambda msg=err_msg: messagebox.showerror("Playlist Error", f"Failed to read playlist: {msg}"))
         finally:
-            self.root.after(0, self.download_progress.stop)
-            self.root.after(0, self.download_progress.pack_forget)
-            self.root.after(0, lambda: self.download_button.config(state=tk.NORMAL, text="Download"))
+            self.root.after(0, self.on_playlist_ingested)
+
+    def on_playlist_ingested(self):
+        self.playlists_ingesting -= 1
+        self.on_queue_maybe_drained()
+
+    def update_download_status(self):
+        """Fill the bar with the batch's overall progress and show the queue size and network speed."""
+        from .progress import DOWNLOADING, format_bytes
+        jobs = [job for job in self.download_queue.jobs() if job.id > self.batch_after_id]
+        pending = sum(1 for job in jobs if not job.finished)
+        if jobs:
+            done = sum(1.0 if job.finished else (job.progress or {}).get('fraction', 0.0) for job in jobs)
+            self.download_progress.config(value=100 * done / len(jobs))
+        speed = sum(job.progress.get('speed') or 0 for job in jobs
+                    if not job.finished and job.progress and job.progress['phase'] == DOWNLOADING)
+
+        if pending and speed:
+            self.download_button.config(text=f"Download ({pending} in queue, {format_bytes(speed)}/s)")
+        elif pending:
+            self.download_button.config(text=f"Download ({pending} in queue)")
+        else:
+            self.download_button.config(text="Download")
+
+    def on_job_update(self, job):
+        from .jobs import DONE, FAILED, FINAL_STATES
+        if job.state not in FINAL_STATES:
+            self.update_download_status()
+            return
+
+        if job.state == DONE and job.duplicate:
+            self.batch_skipped.append(job.title)
+        elif job.state == DONE:
+            self.batch_done.append(job.title)
+        elif job.state == FAILED:
+            self.batch_failed.append(job)
+            retry_note = "\n\nIt will be retried the next time 0music starts." if job.retryable else ""
+            messagebox.showerror("Download Error", f"Failed to download {job.url}: {job.error}{retry_note}")
+
+        self.on_queue_maybe_drained()
+
+    def on_queue_maybe_drained(self):
+        self.update_download_status()
+        if self.download_queue.pending() or self.playlists_ingesting or self.urls_submitting:
+            return
+
+        # Queue drained: hide progress and summarise the batch
+        self.download_progress.pack_forget()
+        self.download_progress.config(value=0)
+        jobs = self.download_queue.jobs()
+        if jobs:
+            self.batch_after_id = jobs[-1].id
+        # The batch is summarised below; a long session should not keep every job it ever ran
+        self.download_queue.clear_finished()
+        if len(self.batch_done) == 1:
+            messagebox.showinfo("Downloaded", f"'{self.batch_done[0]}' has been saved.")
+        elif self.batch_done:
+            messagebox.showinfo("Downloaded", f"{len(self.batch_done)} songs have been saved.")
+        elif len(self.batch_skipped) == 1:
+            messagebox.showinfo("Already Downloaded", f"'{self.batch_skipped[0]}' is already in your library.")
+        elif self.batch_skipped:
+            messagebox.showinfo("Already Downloaded", f"{len(self.batch_skipped)} songs are already in your library.")
+        self.batch_done = []
+        self.batch_skipped = []
+        self.batch_failed = []
 
     def on_closing(self):
         self.stop_playback()
+        if self._download_queue is not None:
+            self._download_queue.shutdown(wait=False)
+        if self._preview is not None:
+            self._preview.shutdown()
+        close_db()
         if self.vlc_player:
             self.vlc_player.release()
         if self.vlc_instance:
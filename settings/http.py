@@ -0,0 +1,52 @@
+# settings/http.py
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .config import HTTP_POOL_SIZE, HTTP_RETRIES
+from .metrics import record_retry
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide requests.Session with keep-alive pooling and retry/backoff.
+
+    Connections to i.ytimg.com and friends are reused across previews, covers
+    and worker threads instead of a new TCP+TLS handshake per image.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET', 'HEAD']),
+            )
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def fetch_bytes(url, timeout=10):
+    response = get_session().get(url, timeout=timeout)
+    # urllib3 keeps the attempts it retried on the response
+    retries = getattr(response.raw, 'retries', None)
+    if retries is not None:
+        record_retry("http", len(retries.history))
+    response.raise_for_status()
+    return response.content
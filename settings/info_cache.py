@@ -0,0 +1,135 @@
+# settings/info_cache.py
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from .config import INFO_CACHE_PATH, INFO_CACHE_MAX_ENTRIES, INFO_CACHE_DEFAULT_TTL
+from .utils import extract_video_id
+
+# Info keys that are large and never used by preview or download
+DROPPED_INFO_KEYS = ('automatic_captions', 'subtitles', 'heatmap', 'chapters', 'requested_formats',
+                     'requested_downloads', 'requested_subtitles', 'description')
+
+# Treat stream URLs as expired a little early so a download never starts on a dying URL
+EXPIRY_MARGIN = 300
+
+_EXPIRE_RE = re.compile(r'[?&/]expire[=/](\d+)')
+
+
+# last_access only drives LRU eviction, so a hit rewrites it at most this often (seconds)
+LAST_ACCESS_RESOLUTION = 3600
+
+_initialized = False
+_init_lock = threading.Lock()
+_local = threading.local()
+
+def _connect():
+    """Per-thread cache connection, reused across calls; the schema is created on first use in this process."""
+    global _initialized
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        return conn
+    with _init_lock:
+        if not _initialized:
+            init_info_cache()
+            _initialized = True
+    conn = sqlite3.connect(INFO_CACHE_PATH, timeout=10)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    _local.conn = conn
+    return conn
+
+
+def init_info_cache():
+    os.makedirs(os.path.dirname(INFO_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(INFO_CACHE_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS video_info (
+            video_id TEXT PRIMARY KEY,
+            title TEXT,
+            uploader TEXT,
+            album TEXT,
+            info TEXT,
+            expires_at REAL,
+            fetched_at REAL,
+            last_access REAL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_info_last_access ON video_info (last_access)')
+    conn.commit()
+    conn.close()
+
+
+def cache_key(url):
+    """Canonical cache key: the YouTube video ID, or the URL itself for other sites."""
+    return extract_video_id(url) or url.strip()
+
+
+def stream_url_expiry(info, now=None):
+    """Earliest expire= timestamp across the format URLs of an info dict."""
+    expiries = []
+    for f in info.get('formats') or []:
+        match = _EXPIRE_RE.search(f.get('url') or '')
+        if match:
+            expiries.append(int(match.group(1)))
+    if expiries:
+        return min(expiries)
+    return (now or time.time()) + INFO_CACHE_DEFAULT_TTL
+
+
+def is_info_fresh(info):
+    """True while the stream URLs in info can still be used for playback or download."""
+    fetched_at = info.get('epoch') or time.time()
+    expires_at = stream_url_expiry(info, now=fetched_at)
+    return time.time() < expires_at - EXPIRY_MARGIN
+
+
+def trim_info(info):
+    """Copy of info without the bulky keys; only formats that carry audio are kept."""
+    trimmed = {k: v for k, v in info.items() if k not in DROPPED_INFO_KEYS}
+    trimmed['formats'] = [f for f in info.get('formats') or [] if f.get('acodec') != 'none']
+    return trimmed
+
+
+def get_cached_info(url):
+    """Look up url in the cache. Returns (info, fresh) or (None, False) on a miss.
+
+    A stale entry still has valid title/uploader/thumbnails for a preview; only
+    its stream URLs need resolving again.
+    """
+    conn = _connect()
+    cursor = conn.cursor()
+    now = time.time()
+    key = cache_key(url)
+    cursor.execute('SELECT info, expires_at, last_access FROM video_info WHERE video_id = ?', (key,))
+    row = cursor.fetchone()
+    if row is None:
+        return None, False
+    info, expires_at, last_access = row
+    if now - (last_access or 0) > LAST_ACCESS_RESOLUTION:
+        cursor.execute('UPDATE video_info SET last_access = ? WHERE video_id = ?', (now, key))
+        conn.commit()
+    return json.loads(info), now < expires_at - EXPIRY_MARGIN
+
+
+def put_cached_info(url, info):
+    """Store a resolved info dict and evict the least recently used entries past the size bound."""
+    trimmed = trim_info(info)
+    now = time.time()
+    conn = _connect()
+    cursor = conn.cursor()
+    cursor.execute(
+        'INSERT OR REPLACE INTO video_info (video_id, title, uploader, album, info, expires_at, fetched_at, last_access) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        (cache_key(url), info.get('title'), info.get('uploader') or info.get('channel'), info.get('album'),
+         json.dumps(trimmed, default=str), stream_url_expiry(trimmed, now), now, now))
+    cursor.execute(
+        'DELETE FROM video_info WHERE video_id IN '
+        '(SELECT video_id FROM video_info ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+        (INFO_CACHE_MAX_ENTRIES,))
+    conn.commit()
+    return trimmed
@@ -0,0 +1,355 @@
+# settings/jobs.py
+
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .config import DOWNLOAD_WORKERS, TRANSCODE_WORKERS, DOWNLOAD_CONNECTIONS, JOURNAL_FAILED_DAYS
+from .database import (journal_add, journal_update, journal_remove, journal_prune, get_unfinished_jobs,
+                       get_song_video_ids, find_song)
+from .downloader import (resolve_info, fetch_audio, transcode_audio, finalize_track, get_output_mode,
+                         track_snapshot, track_from_snapshot, canonical_video_id, dedup_force, hold_safe_title,
+                         release_safe_title)
+from .progress import TrackProgress, ThroughputStats
+from .metrics import Trace
+from .scheduler import classify_error, FATAL
+
+# Job states, in the order a job normally moves through them
+QUEUED = "queued"
+RESOLVING = "resolving"
+DOWNLOADING = "downloading"
+TRANSCODING = "transcoding"
+TAGGING = "tagging"
+DONE = "done"
+FAILED = "failed"
+
+FINAL_STATES = (DONE, FAILED)
+
+
+class DownloadJob:
+    """One URL travelling through the download queue."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url, custom_title=None, custom_author=None, custom_genre=None, info=None, output_mode=None):
+        self.id = next(DownloadJob._ids)
+        self.url = url
+        self.output_mode = output_mode
+        self.custom_title = custom_title
+        self.custom_author = custom_author
+        self.custom_genre = custom_genre
+        self.info = info
+        self.state = QUEUED
+        self.title = None
+        self.error = None
+        self.track = None
+        # Latest progress event (see settings/progress.py)
+        self.progress = None
+        # Stage timings, written to the trace log when metrics are enabled
+        self.trace = Trace(url)
+        # Row in the jobs journal (music.db), None when journaling is off
+        self.journal_id = None
+        # Canonical video id (known up front for YouTube URLs, after resolving otherwise)
+        self.video_id = None
+        self.force = False
+        # True when the video was already in the library and nothing was downloaded
+        self.duplicate = False
+        # A failure worth trying again later (throttling, network); kept in the journal for resume()
+        self.retryable = False
+        self._finished = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in FINAL_STATES
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def __repr__(self):
+        return f"<DownloadJob {self.id} {self.state} {self.url}>"
+
+
+class DownloadQueue:
+    """Runs many downloads at once, keeping network and ffmpeg busy in parallel.
+
+    Resolving and fetching run on a pool of network workers; transcoding and
+    tagging are handed to a second pool sized to the CPU count, so a worker is
+    free to start the next fetch while ffmpeg is still busy with the last one.
+    Subscribers are called with the job on every state change, from the worker
+    thread that made the change. Progress subscribers get (job, event) for
+    every progress event, and stats aggregates them into throughput numbers.
+
+    With journal=True every job and stage transition is recorded in the jobs
+    table of music.db; resume() re-queues whatever an earlier run left
+    unfinished, skipping the stages whose output is already on disk.
+
+    Submissions are deduplicated by canonical video id: a video that is
+    already queued returns the queued job, and one already in the library
+    returns a finished job flagged duplicate, with no network or ffmpeg
+    work, unless force (or DEDUP_POLICY "refresh") asks for a fresh copy.
+    """
+
+    def __init__(self, network_workers=DOWNLOAD_WORKERS, transcode_workers=TRANSCODE_WORKERS, output_mode=None,
+                 journal=True, connections=DOWNLOAD_CONNECTIONS):
+        self.output_mode = get_output_mode(output_mode)
+        # Connections per network worker (ranged or fragment downloads)
+        self.connections = connections
+        self.journal = journal
+        self._network_pool = ThreadPoolExecutor(max_workers=max(1, network_workers), thread_name_prefix="0music-net")
+        self._transcode_pool = ThreadPoolExecutor(max_workers=max(1, transcode_workers), thread_name_prefix="0music-ffmpeg")
+        self._lock = threading.Lock()
+        self._jobs = []
+        # video id -> job downloading it
+        self._inflight = {}
+        self._subscribers = []
+        self._progress_subscribers = []
+        self.stats = ThroughputStats()
+
+    def subscribe(self, callback):
+        """Register callback(job) for state changes; returns a function that unsubscribes."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def subscribe_progress(self, callback):
+        """Register callback(job, event) for progress events; returns a function that unsubscribes."""
+        with self._lock:
+            self._progress_subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._progress_subscribers:
+                    self._progress_subscribers.remove(callback)
+        return unsubscribe
+
+    def submit(self, url, custom_title=None, custom_author=None, custom_genre=None, info=None, force=None):
+        job = DownloadJob(url, custom_title, custom_author, custom_genre, info, self.output_mode)
+        job.force = dedup_force(force)
+        job.video_id = canonical_video_id(url, info)
+        if job.video_id:
+            holder = self._claim(job, job.video_id)
+            if holder is not None:
+                return holder
+            song = None if job.force else find_song(job.video_id)
+            if song:
+                job.duplicate = True
+                job.title = song[1]
+                job.state = DONE
+                job._finished.set()
+                self._release(job)
+                self._add(job)
+                print(f"Already have '{song[1]}' ({job.video_id}), skipping download")
+                return job
+        if self.journal:
+            try:
+                job.journal_id = journal_add(url, custom_title, custom_author, custom_genre, job.output_mode, QUEUED)
+            except Exception as e:
+                print(f"Warning: could not journal {url}: {e}")
+        self._add(job)
+        self._network_pool.submit(self._fetch, job)
+        return job
+
+    def resume(self):
+        """Re-queue jobs an earlier run left unfinished; returns the resumed jobs.
+
+        A job whose downloaded (or already converted) file is still on disk
+        continues from the stage after it; any other job starts over, and
+        yt-dlp picks up its .part file with a range request. Transcodes and
+        tag writes are simply redone, since both overwrite their output.
+        """
+        journal_prune(FAILED, JOURNAL_FAILED_DAYS)
+        rows = get_unfinished_jobs(FINAL_STATES)
+        library = get_song_video_ids() if rows else set()
+        resumed = []
+        for journal_id, url, custom_title, custom_author, custom_genre, output_mode, state, snapshot in rows:
+            video_id = canonical_video_id(url) or (snapshot or {}).get('video_id')
+            # Finished except for the journal update: the song is already in the library
+            if state == TAGGING and video_id in library:
+                journal_remove(journal_id)
+                continue
+            job = DownloadJob(url, custom_title, custom_author, custom_genre, output_mode=output_mode or self.output_mode)
+            job.journal_id = journal_id
+            job.video_id = video_id
+            # Another row for the same video, or a submit() that got there first
+            if job.video_id and self._claim(job, job.video_id) is not None:
+                journal_remove(journal_id)
+                continue
+            self._add(job)
+            resumed.append(job)
+            if snapshot and snapshot.get('filepath') and os.path.exists(snapshot['filepath']):
+                progress = TrackProgress(url, lambda event, job=job: self._on_progress(job, event))
+                job.track = track_from_snapshot(snapshot, progress)
+                if job.track['safe_title']:
+                    hold_safe_title(job.track['safe_title'])
+                self._transcode_pool.submit(self._process, job, state == TAGGING)
+            else:
+                self._network_pool.submit(self._fetch, job)
+        if resumed:
+            print(f"Resumed {len(resumed)} unfinished download(s) from the journal")
+        return resumed
+
+    def submit_many(self, urls, **kwargs):
+        return [self.submit(url, **kwargs) for url in urls]
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def clear_finished(self):
+        """Forget done and failed jobs, e.g. once a batch has been reported; returns how many were dropped."""
+        with self._lock:
+            kept = [job for job in self._jobs if not job.finished]
+            dropped = len(self._jobs) - len(kept)
+            self._jobs = kept
+        return dropped
+
+    def pending(self):
+        """Number of jobs that have not reached done/failed yet."""
+        return sum(1 for job in self.jobs() if not job.finished)
+
+    def wait(self, timeout=None):
+        """Block until every submitted job is finished. Returns False on timeout."""
+        for job in self.jobs():
+            if not job.wait(timeout):
+                return False
+        return True
+
+    def shutdown(self, wait=True):
+        self._network_pool.shutdown(wait=wait, cancel_futures=not wait)
+        self._transcode_pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _claim(self, job, video_id):
+        """Make job the one downloading video_id; returns the unfinished job already holding it, if any."""
+        with self._lock:
+            holder = self._inflight.get(video_id)
+            if holder is not None and holder is not job and not holder.finished:
+                return holder
+            self._inflight[video_id] = job
+        return None
+
+    def _skip_duplicate(self, job):
+        """After resolving, a non-YouTube URL may turn out to be a video we already have or are fetching."""
+        job.video_id = job.video_id or canonical_video_id(job.url, job.info)
+        if not job.video_id:
+            return False
+        holder = self._claim(job, job.video_id)
+        song = None if job.force else find_song(job.video_id)
+        if holder is None and song is None:
+            return False
+        job.duplicate = True
+        if song:
+            job.title = song[1]
+            print(f"Already have '{job.title}' ({job.video_id}), skipping download")
+        else:
+            # The holder may not have resolved yet, but this job has
+            job.title = holder.title or (job.info or {}).get('title') or f"queued (same video as job {holder.id})"
+            print(f"'{job.title}' ({job.video_id}) is already queued as job {holder.id}, skipping download")
+        self._set_state(job, DONE)
+        return True
+
+    def _release(self, job):
+        """Forget a finished job's claim on its video id."""
+        with self._lock:
+            if job.video_id and self._inflight.get(job.video_id) is job:
+                del self._inflight[job.video_id]
+
+    def _add(self, job):
+        with self._lock:
+            self._jobs.append(job)
+        self._notify(job)
+
+    def _notify(self, job):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(job)
+            except Exception as e:
+                print(f"[ERROR] Job subscriber failed: {e}")
+
+    def _on_progress(self, job, event):
+        job.progress = event
+        self.stats.add(event)
+        with self._lock:
+            subscribers = list(self._progress_subscribers)
+        for callback in subscribers:
+            try:
+                callback(job, event)
+            except Exception as e:
+                print(f"[ERROR] Progress subscriber failed: {e}")
+
+    def _set_state(self, job, state, track=None):
+        job.state = state
+        self._journal(job, state, track)
+        self._notify(job)
+        if state in FINAL_STATES:
+            self._release(job)
+            job._finished.set()
+
+    def _journal(self, job, state, track=None):
+        if job.journal_id is None:
+            return
+        try:
+            if state == DONE:
+                journal_remove(job.journal_id)
+            elif state == FAILED and job.retryable:
+                # Still unfinished as far as the journal goes, so the next resume() picks it up again
+                journal_update(job.journal_id, QUEUED, error=job.error)
+            else:
+                journal_update(job.journal_id, state, track=track_snapshot(track) if track else None,
+                               error=job.error if state == FAILED else None)
+        except Exception as e:
+            print(f"Warning: could not journal {job.url}: {e}")
+
+    def _fail(self, job, error):
+        print(f"Download failed for {job.url}: {error}")
+        job.error = error
+        job.retryable = classify_error(error)[0] != FATAL
+        if job.track:
+            release_safe_title(job.track['safe_title'])
+        job.trace.finish(error)
+        self._set_state(job, FAILED)
+
+    def _fetch(self, job):
+        progress = TrackProgress(job.url, lambda event: self._on_progress(job, event))
+        try:
+            with job.trace.active():
+                if job.info is None:
+                    self._set_state(job, RESOLVING)
+                    progress.enter(RESOLVING)
+                    job.info = resolve_info(job.url)
+                if self._skip_duplicate(job):
+                    job.info = None
+                    return
+                info = job.info
+                self._set_state(job, DOWNLOADING)
+                job.track = fetch_audio(job.url, job.custom_title, job.custom_author, job.custom_genre,
+                                        info=info, output_mode=job.output_mode, progress=progress,
+                                        connections=self.connections)
+            # Journal the downloaded file now: the job may wait for a free transcode worker
+            self._journal(job, DOWNLOADING, job.track)
+            # Drop the reference so finished jobs do not pin large info dicts
+            job.info = None
+        except Exception as e:
+            self._fail(job, e)
+            return
+        self._transcode_pool.submit(self._process, job)
+
+    def _process(self, job, transcoded=False):
+        try:
+            with job.trace.active():
+                if not transcoded:
+                    # The downloaded file is recorded first, so a restart does not fetch it again
+                    self._set_state(job, TRANSCODING, track=job.track)
+                    transcode_audio(job.track)
+                self._set_state(job, TAGGING, track=job.track)
+                job.title = finalize_track(job.track)
+            job.trace.finish()
+            self._set_state(job, DONE)
+        except Exception as e:
+            self._fail(job, e)
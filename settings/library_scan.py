@@ -0,0 +1,217 @@
+# settings/library_scan.py
+#
+# Library reconciler: keeps music.db in step with the files in OUTPUT_DIR and
+# the Music auto-add folder. Both roots are walked with os.scandir. A file
+# whose (size, mtime, inode) stamp matches the stored one is not opened. Only
+# new or changed files have their tags read (mutagen, on a thread pool), and
+# then the path, size, duration, bitrate and codec columns are upserted. Files
+# added by hand become new songs. Songs whose file is gone are flagged missing,
+# not deleted; the auto-add folder is only a way into Music.app, so files that
+# leave it were imported, not lost. Files that belong to a download still in progress (or one left
+# in the jobs journal) are not indexed; the download records them itself.
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .config import OUTPUT_DIR, MUSIC_AUTO_ADD, LIBRARY_SCAN_WORKERS, LIBRARY_SCAN_SETTLE
+from .database import get_scan_rows, apply_scan, get_unfinished_jobs
+
+AUDIO_EXTENSIONS = frozenset(('.mp3', '.m4a', '.mp4', '.opus', '.ogg', '.flac', '.aac', '.wav'))
+# Containers yt-dlp downloads into that no output mode produces: in OUTPUT_DIR they are sources awaiting conversion
+SOURCE_EXTENSIONS = frozenset(('.webm', '.mp4', '.mkv', '.3gp'))
+# Codec names for containers whose mutagen info has no codec attribute
+CODECS = {'MP3': 'mp3', 'EasyMP3': 'mp3', 'OggOpus': 'opus', 'OggVorbis': 'vorbis', 'FLAC': 'flac', 'WAVE': 'pcm'}
+# Scan results written per transaction
+WRITE_BATCH = 500
+
+_scan_lock = threading.Lock()
+
+
+def iter_audio_files(root, extensions=AUDIO_EXTENSIONS):
+    """Yield (path, stat) for every audio file under root; symlinked directories are not followed."""
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif (os.path.splitext(entry.name)[1].lower() in extensions
+                          and '.temp.' not in entry.name and entry.is_file()):
+                        yield entry.path, entry.stat()
+                except OSError:
+                    continue
+
+
+def read_audio_info(path):
+    """Duration, bitrate, codec and title/artist/genre tags of an audio file; None if mutagen can't read it."""
+    import mutagen
+    audio = mutagen.File(path, easy=True)
+    if audio is None:
+        return None
+    info = audio.info
+    tags = audio.tags or {}
+
+    def first(key):
+        values = tags.get(key) if hasattr(tags, 'get') else None
+        return str(values[0]) if values else None
+
+    return {
+        'duration': getattr(info, 'length', None),
+        'bitrate': getattr(info, 'bitrate', None) or None,
+        'codec': getattr(info, 'codec', None) or CODECS.get(type(audio).__name__, type(audio).__name__.lower()),
+        'title': first('title'),
+        'artist': first('artist'),
+        'genre': first('genre'),
+    }
+
+
+def _read(item):
+    path, st, row = item
+    try:
+        return path, st, row, read_audio_info(path), None
+    except Exception as e:
+        return path, st, row, None, e
+
+
+def reconcile_library(roots=None, full=False, workers=LIBRARY_SCAN_WORKERS, settle=LIBRARY_SCAN_SETTLE):
+    """Index the library folders into music.db; returns a summary dict, or None if a scan is already running.
+
+    full re-reads every file instead of trusting the stored stamps. Files
+    modified in the last settle seconds are left for the next scan, since they
+    may be downloads still being written.
+    """
+    if not _scan_lock.acquire(blocking=False):
+        print("Library scan already running")
+        return None
+    try:
+        return _reconcile(roots, full, workers, settle)
+    finally:
+        _scan_lock.release()
+
+
+def _moved_row(candidates, seen):
+    """The song a file at a new path belongs to: same file name, and its recorded file is gone."""
+    for row in candidates:
+        if row[0] not in seen and (not row[2] or not os.path.exists(row[2])):
+            return row
+    return None
+
+
+def _job_stems():
+    """File name stems owned by downloads in flight here, or journaled by any run (including failed ones)."""
+    from .downloader import reserved_titles
+    stems = reserved_titles()
+    # Only done jobs leave the journal, so this is every queued, in-flight and failed one
+    for row in get_unfinished_jobs(final_states=('done',)):
+        snapshot = row[7] or {}
+        if snapshot.get('safe_title'):
+            stems.add(snapshot['safe_title'])
+        if snapshot.get('filepath'):
+            stems.add(os.path.splitext(os.path.basename(snapshot['filepath']))[0])
+    return stems
+
+
+def _reconcile(roots, full, workers, settle):
+    started = time.perf_counter()
+    if roots is None:
+        roots = [root for root in (OUTPUT_DIR, MUSIC_AUTO_ADD) if root]
+    roots = [os.path.abspath(root) for root in roots if os.path.isdir(root)]
+    counts = {'scanned': 0, 'unchanged': 0, 'updated': 0, 'added': 0, 'missing': 0, 'recent': 0, 'in_progress': 0,
+              'imported': 0, 'errors': 0}
+
+    rows = get_scan_rows()
+    by_path = {row[2]: row for row in rows if row[2]}
+    # A file at an unknown path may be a song recorded before paths were stored, or one that was moved
+    by_name = {}
+    for row in rows:
+        if row[1]:
+            by_name.setdefault(row[1], []).append(row)
+
+    seen = set()
+    to_read = []
+    job_stems = _job_stems()
+    output_dir = os.path.abspath(OUTPUT_DIR)
+    now = time.time()
+    for root in roots:
+        extensions = AUDIO_EXTENSIONS - SOURCE_EXTENSIONS if root == output_dir else AUDIO_EXTENSIONS
+        for path, st in iter_audio_files(root, extensions):
+            counts['scanned'] += 1
+            row = by_path.get(path)
+            if os.path.splitext(os.path.basename(path))[0] in job_stems:
+                # Being downloaded again (or left by a failed job): keep its song, if any, but don't touch it
+                if row is not None:
+                    seen.add(row[0])
+                counts['in_progress'] += 1
+                continue
+            if row is None:
+                row = _moved_row(by_name.get(os.path.basename(path), ()), seen)
+            if row is not None:
+                seen.add(row[0])
+            if now - st.st_mtime < settle:
+                counts['recent'] += 1
+                continue
+            stamp = (st.st_size, st.st_mtime_ns, st.st_ino)
+            if row is not None and not full and row[2] == path and tuple(row[3:6]) == stamp and not row[6]:
+                counts['unchanged'] += 1
+                continue
+            to_read.append((path, st, row))
+
+    # Music.app takes files out of its auto-add folder once it has imported them, so a song last seen
+    # there (or one whose path was never recorded, which may have gone the same way) is not missing
+    transit = os.path.abspath(MUSIC_AUTO_ADD) if MUSIC_AUTO_ADD else None
+    missing_ids = []
+    for song_id, filename, path, size, mtime_ns, inode, missing in rows:
+        if song_id in seen or missing:
+            continue
+        if transit and (path is None or path.startswith(transit + os.sep)):
+            counts['imported'] += 1
+            continue
+        # Outside the scanned roots (e.g. an auto-add folder that is not mounted) only a failed stat counts
+        if path and not any(path.startswith(root + os.sep) for root in roots) and os.path.exists(path):
+            continue
+        missing_ids.append(song_id)
+    counts['missing'] = len(missing_ids)
+
+    updates, inserts = [], []
+
+    def flush():
+        if updates or inserts:
+            apply_scan(updates, inserts)
+            updates.clear()
+            inserts.clear()
+
+    if to_read:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="0music-scan") as pool:
+            for path, st, row, info, error in pool.map(_read, to_read):
+                if error is not None:
+                    print(f"Warning: could not read {path}: {error}")
+                    counts['errors'] += 1
+                info = info or {}
+                columns = (path, st.st_size, st.st_mtime_ns, st.st_ino,
+                           info.get('duration'), info.get('bitrate'), info.get('codec'))
+                if row is not None:
+                    updates.append(columns + (row[0],))
+                    counts['updated'] += 1
+                else:
+                    name = os.path.basename(path)
+                    title = info.get('title') or os.path.splitext(name)[0]
+                    inserts.append((title, info.get('artist'), info.get('genre'), name) + columns)
+                    counts['added'] += 1
+                if len(updates) + len(inserts) >= WRITE_BATCH:
+                    flush()
+    flush()
+    if missing_ids:
+        apply_scan(missing_ids=missing_ids)
+
+    elapsed = time.perf_counter() - started
+    summary = dict(counts, roots=roots, elapsed=round(elapsed, 3),
+                   files_per_s=round(counts['scanned'] / elapsed, 1) if elapsed else 0.0)
+    print(f"Library scan: {counts['scanned']} files in {elapsed:.2f}s ({counts['unchanged']} unchanged, "
+          f"{counts['updated']} updated, {counts['added']} added, {counts['missing']} missing)")
+    return summary
@@ -0,0 +1,251 @@
+# settings/metrics.py
+#
+# Opt-in stage timing (ZEROMUSIC_METRICS=1 or the CLI's --metrics flag).
+#
+# Stages are timed with `with timed("ffmpeg"):` anywhere in the pipeline.
+# Durations go into process-wide histograms, and when a per-track Trace is
+# active on the current thread the span is added to it as well. Metrics are
+# exported as Prometheus text or JSON; finished traces are appended to a
+# JSON-lines trace log. When disabled, timed() hands back a shared no-op.
+
+import json
+import os
+import threading
+import time
+from .config import DATA_DIR, METRICS_ENABLED, METRICS_FORMAT, METRICS_PATH, TRACE_LOG_PATH
+
+# Pipeline stages, in pipeline order
+STAGES = (
+    "extract", "format_select", "network_fetch", "ffmpeg",
+    "thumbnail_fetch", "thumbnail_process", "tag_write", "file_move", "db_insert",
+)
+
+# Histogram bucket bounds in seconds
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_lock = threading.Lock()
+_local = threading.local()
+_enabled = METRICS_ENABLED
+_format = METRICS_FORMAT
+_path = METRICS_PATH
+_trace_path = TRACE_LOG_PATH
+
+_histograms = {}   # stage -> {'count', 'sum', 'max', 'buckets'}
+_failures = {}     # stage -> count
+_retries = {}      # stage -> count
+_tracks = {'ok': 0, 'failed': 0}
+
+
+def enable(path=None, fmt=None, trace_path=None):
+    """Turn instrumentation on at runtime, optionally overriding the output files."""
+    global _enabled, _path, _format, _trace_path
+    _enabled = True
+    _format = fmt or _format
+    _path = path or _path
+    _trace_path = trace_path or _trace_path
+
+
+def _default_path(fmt):
+    return os.path.join(DATA_DIR, "metrics.json" if fmt == "json" else "metrics.prom")
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _failures.clear()
+        _retries.clear()
+        _tracks.update(ok=0, failed=0)
+
+
+def _observe(stage, seconds, ok):
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS)}
+        hist['count'] += 1
+        hist['sum'] += seconds
+        hist['max'] = max(hist['max'], seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist['buckets'][i] += 1
+        if not ok:
+            _failures[stage] = _failures.get(stage, 0) + 1
+
+
+def record_failure(stage):
+    """Count a failure that was handled without raising (e.g. a tag write that is only logged)."""
+    if _enabled:
+        with _lock:
+            _failures[stage] = _failures.get(stage, 0) + 1
+
+
+def record_retry(stage, count=1):
+    if _enabled and count:
+        with _lock:
+            _retries[stage] = _retries.get(stage, 0) + count
+
+
+class _Span:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        ok = exc_type is None
+        _observe(self.stage, seconds, ok)
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            trace.add(self.stage, self.started, seconds, ok)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def timed(stage):
+    """Context manager timing one stage; free when metrics are disabled."""
+    return _Span(stage) if _enabled else _NO_SPAN
+
+
+class Trace:
+    """Spans recorded for one track, written to the trace log when it finishes.
+
+    A track moves between threads (network pool, ffmpeg pool), so each stage
+    function activates the trace on its own thread with `with trace.active():`.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.spans = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, stage, started, seconds, ok):
+        with self._lock:
+            self.spans.append({
+                'stage': stage,
+                'start': round(started - self.started, 4),
+                'seconds': round(seconds, 4),
+                'ok': ok,
+            })
+
+    def active(self):
+        return _Activation(self)
+
+    def finish(self, error=None):
+        """Record the outcome once; writes the trace line and refreshes the metrics file."""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+        if not _enabled:
+            return
+        with _lock:
+            _tracks['failed' if error else 'ok'] += 1
+        record = {
+            'url': self.url,
+            'started': round(self.started_at, 3),
+            'seconds': round(time.perf_counter() - self.started, 4),
+            'ok': error is None,
+            'error': str(error) if error else None,
+            'spans': self.spans,
+        }
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(_trace_path)), exist_ok=True)
+            with open(_trace_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            print(f"[ERROR] Could not write trace log: {e}")
+        write_metrics()
+
+
+class _Activation:
+    __slots__ = ('trace', 'previous')
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __enter__(self):
+        self.previous = getattr(_local, 'trace', None)
+        _local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.trace = self.previous
+        return False
+
+
+def snapshot():
+    """Current metrics as a JSON-serialisable dict."""
+    with _lock:
+        return {
+            'stages': {stage: {'count': h['count'], 'sum': round(h['sum'], 4), 'max': round(h['max'], 4),
+                               'mean': round(h['sum'] / h['count'], 4) if h['count'] else 0.0}
+                       for stage, h in _histograms.items()},
+            'failures': dict(_failures),
+            'retries': dict(_retries),
+            'tracks': dict(_tracks),
+        }
+
+
+def render_prometheus():
+    lines = [
+        '# HELP zeromusic_stage_seconds Time spent in each pipeline stage.',
+        '# TYPE zeromusic_stage_seconds histogram',
+    ]
+    with _lock:
+        for stage, h in sorted(_histograms.items()):
+            for bound, count in zip(BUCKETS, h['buckets']):
+                lines.append(f'zeromusic_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'zeromusic_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h["count"]}')
+            lines.append(f'zeromusic_stage_seconds_sum{{stage="{stage}"}} {h["sum"]:.6f}')
+            lines.append(f'zeromusic_stage_seconds_count{{stage="{stage}"}} {h["count"]}')
+        lines += ['# HELP zeromusic_stage_failures_total Failed stage runs.',
+                  '# TYPE zeromusic_stage_failures_total counter']
+        lines += [f'zeromusic_stage_failures_total{{stage="{stage}"}} {n}' for stage, n in sorted(_failures.items())]
+        lines += ['# HELP zeromusic_retries_total Retries, by stage.',
+                  '# TYPE zeromusic_retries_total counter']
+        lines += [f'zeromusic_retries_total{{stage="{stage}"}} {n}' for stage, n in sorted(_retries.items())]
+        lines += ['# HELP zeromusic_tracks_total Finished tracks, by result.',
+                  '# TYPE zeromusic_tracks_total counter']
+        lines += [f'zeromusic_tracks_total{{result="{result}"}} {n}' for result, n in sorted(_tracks.items())]
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(path=None, fmt=None):
+    """Write the metrics file atomically (Prometheus text or JSON)."""
+    if not _enabled:
+        return None
+    fmt = fmt or _format
+    path = path or _path or _default_path(fmt)
+    data = json.dumps(snapshot(), indent=2) if fmt == 'json' else render_prometheus()
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[ERROR] Could not write metrics: {e}")
+        return None
+    return path
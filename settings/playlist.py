@@ -0,0 +1,94 @@
+# settings/playlist.py
+
+from urllib.parse import urlparse, parse_qs
+from yt_dlp import YoutubeDL
+from .downloader import get_ydl_opts, get_scheduler, canonical_video_id, dedup_force
+from .database import get_song_video_ids
+from .utils import extract_video_id
+
+# URL paths that name a collection of videos rather than a single one
+PLAYLIST_PATH_PREFIXES = ('/playlist', '/channel/', '/c/', '/user/', '/@')
+
+
+def is_playlist_url(url):
+    """True for playlist/channel URLs. A video URL (watch, youtu.be, shorts, ...) that merely carries &list= is a single video."""
+    if extract_video_id(url):
+        return False
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    if 'v' in query:
+        return False
+    if 'list' in query:
+        return True
+    return parsed.path.startswith(PLAYLIST_PATH_PREFIXES)
+
+
+def iter_playlist_entries(url, ydl=None):
+    """Yield flat entries of a playlist or channel as yt-dlp discovers them.
+
+    Extraction is flat and lazy, so entries arrive page by page instead of after
+    the whole list has been materialised. Channel tabs (Videos, Shorts, ...) are
+    expanded recursively.
+    """
+    if ydl is None:
+        ydl_opts = get_ydl_opts()
+        ydl_opts.update({
+            'extract_flat': 'in_playlist',
+            'lazy_playlist': True,
+        })
+        with YoutubeDL(ydl_opts) as ydl:
+            yield from iter_playlist_entries(url, ydl)
+        return
+
+    # Each (sub)playlist page set counts against the site's extraction rate
+    get_scheduler().lane(url).take_token()
+    result = ydl.extract_info(url, download=False, process=False)
+    if result.get('_type') in ('url', 'url_transparent') and result.get('url') != url:
+        yield from iter_playlist_entries(result['url'], ydl)
+        return
+    if result.get('_type') != 'playlist':
+        yield result
+        return
+
+    for entry in result.get('entries') or []:
+        if not entry:
+            continue
+        entry_url = entry.get('url')
+        if entry.get('_type') == 'playlist' or (entry_url and is_playlist_url(entry_url)):
+            yield from iter_playlist_entries(entry_url, ydl)
+        else:
+            yield entry
+
+
+def enqueue_playlist(queue, url, custom_genre=None, on_entry=None, force=None):
+    """Stream the entries of a playlist/channel URL into a DownloadQueue.
+
+    Entries whose video id is already in the music table are skipped (unless
+    force), so running the same playlist again after an interruption picks up
+    where it stopped. on_entry(entry, job) is called for each entry; job is
+    None when skipped. Returns (queued, skipped) counts.
+    """
+    force = dedup_force(force)
+    known_ids = set() if force else get_song_video_ids()
+    queued = skipped = 0
+    for entry in iter_playlist_entries(url):
+        entry_url = entry.get('webpage_url') or entry.get('url')
+        if not entry_url:
+            continue
+        video_id = canonical_video_id(entry_url, entry)
+        if video_id in known_ids:
+            skipped += 1
+            job = None
+        else:
+            job = queue.submit(entry_url, custom_genre=custom_genre, force=force)
+            if job.duplicate:
+                skipped += 1
+                job = None
+            else:
+                queued += 1
+            if video_id:
+                known_ids.add(video_id)
+        if on_entry:
+            on_entry(entry, job)
+    print(f"Playlist {url}: {queued} queued, {skipped} already downloaded")
+    return queued, skipped
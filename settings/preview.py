@@ -0,0 +1,102 @@
+# settings/preview.py
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .config import PREVIEW_WORKERS, PREVIEW_DEBOUNCE
+from .downloader import extract_video_info
+from .info_cache import is_info_fresh
+
+RECENT_RESULTS = 8
+
+
+class PreviewService:
+    """Resolves URL previews without redundant or out-of-order work.
+
+    - Debounce: a request only starts after PREVIEW_DEBOUNCE seconds without a
+      newer one, so tabbing through the form fires nothing extra.
+    - Coalescing: requests for a URL that is already resolving attach to the
+      running lookup, and recently finished results are served from memory
+      (without their stream URL once it has expired).
+    - Generations: every request bumps a token; results for older tokens are
+      dropped, so a slow lookup can never overwrite a newer preview.
+    - Bounded concurrency: lookups run on a pool of PREVIEW_WORKERS threads.
+
+    callback(url, result, error) runs on a worker thread.
+    """
+
+    def __init__(self, resolver=extract_video_info, max_workers=PREVIEW_WORKERS, debounce=PREVIEW_DEBOUNCE):
+        self.resolver = resolver
+        self.debounce = debounce
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="0music-preview")
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._timer = None
+        self._inflight = {}
+        # Finished results of the last few URLs, so flipping back costs nothing
+        self._recent = OrderedDict()
+
+    def request(self, url, callback):
+        """Ask for the preview of url, superseding any earlier request. Returns its generation token."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            result = self._recent.get(url)
+            if result is not None:
+                self._recent.move_to_end(url)
+                if result.get('stream_url') and result.get('info') and not is_info_fresh(result['info']):
+                    # Signed stream URLs expire; playback fetches a new one (see refresh_stream_url)
+                    result = self._recent[url] = dict(result, stream_url=None)
+            else:
+                result = None
+                self._timer = threading.Timer(self.debounce, self._start, args=(generation, url, callback))
+                self._timer.daemon = True
+                self._timer.start()
+        if result is not None:
+            callback(url, result, None)
+        return generation
+
+    def cancel(self):
+        """Drop whatever is pending; late results of earlier requests are discarded."""
+        with self._lock:
+            self._generation += 1
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def is_current(self, generation):
+        with self._lock:
+            return generation == self._generation
+
+    def shutdown(self):
+        self.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self, generation, url, callback):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._timer = None
+            future = self._inflight.get(url)
+            if future is None:
+                future = self._pool.submit(self.resolver, url)
+                self._inflight[url] = future
+                future.add_done_callback(lambda f: self._finished(url, f))
+        future.add_done_callback(lambda f: self._deliver(generation, url, f, callback))
+
+    def _finished(self, url, future):
+        with self._lock:
+            self._inflight.pop(url, None)
+            if not future.cancelled() and future.exception() is None:
+                self._recent[url] = future.result()
+                while len(self._recent) > RECENT_RESULTS:
+                    self._recent.popitem(last=False)
+
+    def _deliver(self, generation, url, future, callback):
+        if future.cancelled() or not self.is_current(generation):
+            return
+        error = future.exception()
+        callback(url, None if error else future.result(), error)
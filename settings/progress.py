@@ -0,0 +1,177 @@
+# settings/progress.py
+
+import threading
+import time
+from .config import PROGRESS_INTERVAL
+
+# Phases a track goes through, and the share of its progress bar each one gets
+RESOLVING = "resolving"
+DOWNLOADING = "downloading"
+TRANSCODING = "transcoding"
+TAGGING = "tagging"
+DONE = "done"
+
+PHASES = (RESOLVING, DOWNLOADING, TRANSCODING, TAGGING)
+PHASE_WEIGHTS = {
+    RESOLVING: 0.05,
+    DOWNLOADING: 0.75,
+    TRANSCODING: 0.15,
+    TAGGING: 0.05,
+}
+
+
+def format_bytes(n):
+    """Human-readable size, e.g. 3.4 MB."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+class TrackProgress:
+    """Collects yt-dlp progress/postprocessor hook calls for one track into progress events.
+
+    Every event is a dict with url, phase, downloaded_bytes, total_bytes,
+    speed (bytes/s), eta (s), fraction (0-1 over the whole track), elapsed and
+    phase_durations (seconds per finished phase). During a multi-connection
+    download, chunks lists the byte ranges in flight with their own
+    downloaded_bytes and speed; it is None otherwise. Byte updates are throttled
+    to one event per PROGRESS_INTERVAL; phase changes are always reported.
+    callback(event) runs on whichever thread did the work.
+    """
+
+    def __init__(self, url, callback=None, interval=PROGRESS_INTERVAL):
+        self.url = url
+        self.callback = callback
+        self.interval = interval
+        self.phase = None
+        self.started = time.perf_counter()
+        self.phase_started = self.started
+        self.phase_durations = {}
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+        self.speed = None
+        self.eta = None
+        self.chunks = None
+        self.phase_fraction = 0.0
+        self._last_emit = 0.0
+        self._lock = threading.Lock()
+
+    def enter(self, phase):
+        """Close the current phase (recording its duration) and start another."""
+        with self._lock:
+            now = time.perf_counter()
+            if self.phase is not None and self.phase != DONE:
+                self.phase_durations[self.phase] = self.phase_durations.get(self.phase, 0.0) + now - self.phase_started
+            self.phase = phase
+            self.phase_started = now
+            self.phase_fraction = 0.0
+        self._emit(force=True)
+
+    def finish(self):
+        self.enter(DONE)
+
+    def download_hook(self, d):
+        """yt-dlp progress_hooks entry."""
+        status = d.get('status')
+        if status == 'downloading':
+            self.downloaded_bytes = d.get('downloaded_bytes') or 0
+            self.total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or self.total_bytes
+            self.speed = d.get('speed')
+            self.eta = d.get('eta')
+            self.chunks = d.get('chunks')
+            if self.total_bytes:
+                self.phase_fraction = min(1.0, self.downloaded_bytes / self.total_bytes)
+            self._emit()
+        elif status == 'finished':
+            self.downloaded_bytes = d.get('total_bytes') or d.get('downloaded_bytes') or self.downloaded_bytes
+            self.total_bytes = self.downloaded_bytes
+            self.eta = 0
+            self.chunks = None
+            self.phase_fraction = 1.0
+            self._emit(force=True)
+
+    def postprocessor_hook(self, d):
+        """yt-dlp postprocessor_hooks entry; ffmpeg reports only start and end."""
+        if d.get('status') == 'finished':
+            self.phase_fraction = 1.0
+            self._emit(force=True)
+
+    def fraction(self):
+        if self.phase == DONE:
+            return 1.0
+        if self.phase not in PHASE_WEIGHTS:
+            return 0.0
+        # Phases before the current one count as complete, even if skipped (e.g. no resolving needed)
+        done = sum(PHASE_WEIGHTS[phase] for phase in PHASES[:PHASES.index(self.phase)])
+        return min(1.0, done + PHASE_WEIGHTS[self.phase] * self.phase_fraction)
+
+    def snapshot(self):
+        return {
+            'url': self.url,
+            'phase': self.phase,
+            'downloaded_bytes': self.downloaded_bytes,
+            'total_bytes': self.total_bytes,
+            'speed': self.speed,
+            'eta': self.eta,
+            'chunks': self.chunks,
+            'fraction': self.fraction(),
+            'elapsed': time.perf_counter() - self.started,
+            'phase_durations': dict(self.phase_durations),
+        }
+
+    def _emit(self, force=False):
+        if self.callback is None:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_emit < self.interval:
+            return
+        self._last_emit = now
+        try:
+            self.callback(self.snapshot())
+        except Exception as e:
+            print(f"[ERROR] Progress callback failed: {e}")
+
+
+class ThroughputStats:
+    """Aggregates finished-track events into throughput numbers.
+
+    Feed it every progress event (add); summary() reports tracks, bytes,
+    tracks/s and MB/s over the wall-clock span, network speed over time spent
+    downloading, and total/mean seconds per phase, which shows whether a batch
+    is network-bound or ffmpeg-bound.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = None
+        self.tracks = 0
+        self.bytes = 0
+        self.phase_totals = {}
+
+    def add(self, event):
+        with self._lock:
+            if self.started is None:
+                self.started = time.perf_counter() - event['elapsed']
+            if event['phase'] != DONE:
+                return
+            self.tracks += 1
+            self.bytes += event['downloaded_bytes'] or 0
+            for phase, seconds in event['phase_durations'].items():
+                self.phase_totals[phase] = self.phase_totals.get(phase, 0.0) + seconds
+
+    def summary(self):
+        with self._lock:
+            wall = time.perf_counter() - self.started if self.started is not None else 0.0
+            downloading = self.phase_totals.get(DOWNLOADING, 0.0)
+            return {
+                'tracks': self.tracks,
+                'bytes': self.bytes,
+                'wall_seconds': round(wall, 3),
+                'tracks_per_s': round(self.tracks / wall, 4) if wall else 0.0,
+                'mb_per_s': round(self.bytes / wall / 1e6, 3) if wall else 0.0,
+                'download_mb_per_s': round(self.bytes / downloading / 1e6, 3) if downloading else 0.0,
+                'phase_seconds': {phase: round(total, 3) for phase, total in self.phase_totals.items()},
+                'phase_mean_seconds': {phase: round(total / self.tracks, 3)
+                                       for phase, total in self.phase_totals.items()} if self.tracks else {},
+            }
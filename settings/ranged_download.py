@@ -0,0 +1,279 @@
+# settings/ranged_download.py
+#
+# Multi-connection downloads for plain HTTP(S) audio formats.
+#
+# yt-dlp fetches a progressive stream over a single connection, and googlevideo
+# throttles per connection. RangedHttpFD splits the file into byte ranges that
+# are fetched concurrently over the pooled session from settings/http.py. Each
+# range is written straight to its offset in a preallocated .part file, so
+# there is no reassembly pass. Finished ranges are listed in a .ranges sidecar,
+# and an interrupted download resumes by fetching only the missing ones. A .part
+# without a sidecar (left by a single-connection attempt) is a plain prefix, so
+# the ranges it already covers are kept too.
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from yt_dlp import YoutubeDL
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.utils import DownloadError, determine_protocol
+from .config import RANGE_CHUNK_MAX, RANGE_CHUNK_MIN, HTTP_RETRIES
+from .http import get_session
+from .metrics import record_retry
+
+BLOCK_SIZE = 64 * 1024
+# (connect, read) timeouts for range requests, in seconds
+TIMEOUT = (10, 30)
+# Minimum seconds between progress hook calls; the last byte is always reported
+REPORT_INTERVAL = 0.1
+
+
+def plan_ranges(total, connections):
+    """Split total bytes into inclusive (start, end) ranges of about total/connections bytes.
+
+    No range is larger than RANGE_CHUNK_MAX, so a long file gets more ranges
+    than connections and the workers pull them in order.
+    """
+    size = min(RANGE_CHUNK_MAX, max(RANGE_CHUNK_MIN, -(-total // connections)))
+    return [(start, min(start + size, total) - 1) for start in range(0, total, size)]
+
+
+def discard_ranged_partial(tmpfilename):
+    """Remove a ranged .part file; it has holes, so the single-connection downloader must not resume it."""
+    sidecar = f"{tmpfilename}.ranges"
+    if os.path.exists(sidecar):
+        for path in (tmpfilename, sidecar):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class RangedHttpFD(FileDownloader):
+    """yt-dlp file downloader that fetches one HTTP(S) file over several connections.
+
+    Progress hooks get the usual yt-dlp fields plus 'chunks' (the ranges
+    in flight, each with index, start, end, downloaded_bytes and speed) and
+    'connections'. Servers that do not answer range requests, and files too
+    small to split, fall back to yt-dlp's HttpFD.
+    """
+
+    FD_NAME = 'ranged'
+
+    def __init__(self, ydl, params, connections):
+        super().__init__(ydl, params)
+        self.connections = connections
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @staticmethod
+    def supports(info):
+        """True for a single progressive HTTP(S) stream that needs nothing but headers to fetch."""
+        return (determine_protocol(info) in ('http', 'https')
+                and not info.get('requested_formats')
+                and not info.get('cookies')
+                and not info.get('is_live'))
+
+    def real_download(self, filename, info_dict):
+        url = info_dict['url']
+        headers = dict(info_dict.get('http_headers') or {})
+        tmpfilename = self.temp_name(filename)
+        total = self._probe(url, headers)
+        if not total or total < 2 * RANGE_CHUNK_MIN:
+            discard_ranged_partial(tmpfilename)
+            return self._single_connection(filename, info_dict)
+
+        ranges = plan_ranges(total, self.connections)
+        sidecar = f"{tmpfilename}.ranges"
+        done = self._load_done(sidecar, tmpfilename, total, ranges)
+        self._sidecar = sidecar
+        self._total = total
+        self._ranges = ranges
+        self._done = done
+        # The sidecar goes first: from here on the .part has holes and must never pass for a plain prefix
+        self._save_done()
+        # Sparse preallocation; every range writes into place. A resumed file keeps its bytes.
+        with open(tmpfilename, 'r+b' if done else 'wb') as f:
+            f.truncate(total)
+        self.report_destination(filename)
+
+        self._filename = filename
+        self._tmpfilename = tmpfilename
+        self._info = info_dict
+        self._active = {}
+        self._downloaded = self._resumed = sum(ranges[i][1] - ranges[i][0] + 1 for i in done)
+        self._started = time.perf_counter()
+        self._last_report = 0.0
+
+        pending = [i for i in range(len(ranges)) if i not in done]
+        with ThreadPoolExecutor(max_workers=min(self.connections, len(pending) or 1),
+                                thread_name_prefix="0music-range") as pool:
+            futures = [pool.submit(self._fetch_range, i, url, headers) for i in pending]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                self._stop.set()
+                raise
+
+        self.try_rename(tmpfilename, filename)
+        os.remove(sidecar)
+        self._hook_progress({
+            'status': 'finished',
+            'filename': filename,
+            'downloaded_bytes': total,
+            'total_bytes': total,
+            'elapsed': time.perf_counter() - self._started,
+        }, info_dict)
+        return True
+
+    def _single_connection(self, filename, info_dict):
+        fd = HttpFD(self.ydl, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        return fd.real_download(filename, info_dict)
+
+    def _probe(self, url, headers):
+        """Total size if the server honours range requests, else None."""
+        try:
+            with get_session().get(url, headers={**headers, 'Range': 'bytes=0-0'}, stream=True,
+                                   timeout=TIMEOUT) as response:
+                if response.status_code >= 400:
+                    raise DownloadError(f"HTTP {response.status_code} for {url}")
+                content_range = response.headers.get('Content-Range', '')
+                if response.status_code != 206 or '/' not in content_range:
+                    return None
+                total = content_range.rsplit('/', 1)[1]
+                return int(total) if total.isdigit() else None
+        except requests.RequestException as e:
+            raise DownloadError(f"Could not reach {url}: {e}") from e
+
+    def _load_done(self, sidecar, tmpfilename, total, ranges):
+        """Ranges finished by an interrupted run of the same file and layout."""
+        if self.params.get('continuedl', True) and os.path.exists(sidecar) and os.path.exists(tmpfilename):
+            try:
+                with open(sidecar, encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get('total') == total and [tuple(r) for r in state.get('ranges', [])] == ranges:
+                    self.to_screen(f"[download] Resuming {len(state['done'])}/{len(ranges)} finished ranges")
+                    return set(state['done'])
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: ignoring unreadable range state {sidecar}: {e}")
+        elif self.params.get('continuedl', True) and os.path.exists(tmpfilename) and not os.path.exists(sidecar):
+            # A single-connection attempt wrote a contiguous prefix: every range inside it is done
+            length = os.path.getsize(tmpfilename)
+            done = {i for i, (start, end) in enumerate(ranges) if end < length} if length <= total else set()
+            if done:
+                self.to_screen(f"[download] Resuming {len(done)}/{len(ranges)} ranges from a {length} byte partial file")
+                return done
+        discard_ranged_partial(tmpfilename)
+        return set()
+
+    def _save_done(self):
+        tmp = f"{self._sidecar}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'total': self._total, 'ranges': self._ranges, 'done': sorted(self._done)}, f)
+        os.replace(tmp, self._sidecar)
+
+    def _fetch_range(self, index, url, headers):
+        start, end = self._ranges[index]
+        chunk = {'index': index, 'start': start, 'end': end, 'downloaded_bytes': 0, 'started': time.perf_counter()}
+        with self._lock:
+            self._active[index] = chunk
+        pos = start
+        attempt = 0
+        with open(self._tmpfilename, 'r+b') as f:
+            while pos <= end:
+                if self._stop.is_set():
+                    return
+                try:
+                    with get_session().get(url, headers={**headers, 'Range': f'bytes={pos}-{end}'}, stream=True,
+                                           timeout=TIMEOUT) as response:
+                        if response.status_code != 206:
+                            # A stale or forbidden URL: let download_with_info re-extract
+                            raise DownloadError(f"HTTP {response.status_code} for bytes {pos}-{end} of {url}")
+                        f.seek(pos)
+                        for block in response.iter_content(BLOCK_SIZE):
+                            if self._stop.is_set():
+                                return
+                            block = block[:end + 1 - pos]
+                            f.write(block)
+                            pos += len(block)
+                            self._advance(chunk, len(block))
+                            if pos > end:
+                                break
+                except requests.RequestException as e:
+                    error = e
+                else:
+                    error = "connection closed early"
+                if pos <= end:
+                    attempt += 1
+                    if attempt > HTTP_RETRIES:
+                        raise DownloadError(f"bytes {start}-{end} of {url} failed: {error}")
+                    record_retry("network_fetch")
+                    time.sleep(0.5 * 2 ** (attempt - 1))
+        with self._lock:
+            self._active.pop(index, None)
+            self._done.add(index)
+            self._save_done()
+
+    def _advance(self, chunk, nbytes):
+        """Count nbytes for chunk and call the progress hooks, at most every REPORT_INTERVAL."""
+        with self._lock:
+            chunk['downloaded_bytes'] += nbytes
+            self._downloaded += nbytes
+            now = time.perf_counter()
+            if now - self._last_report < REPORT_INTERVAL and self._downloaded < self._total:
+                return
+            self._last_report = now
+            elapsed = now - self._started
+            speed = (self._downloaded - self._resumed) / elapsed if elapsed else None
+            self._hook_progress({
+                'status': 'downloading',
+                'filename': self._filename,
+                'tmpfilename': self._tmpfilename,
+                'downloaded_bytes': self._downloaded,
+                'total_bytes': self._total,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': (self._total - self._downloaded) / speed if speed else None,
+                'connections': self.connections,
+                'chunks': [{
+                    'index': c['index'],
+                    'start': c['start'],
+                    'end': c['end'],
+                    'downloaded_bytes': c['downloaded_bytes'],
+                    'speed': c['downloaded_bytes'] / max(now - c['started'], 1e-6),
+                } for c in sorted(self._active.values(), key=lambda c: c['index'])],
+            }, self._info)
+
+
+class RangedYoutubeDL(YoutubeDL):
+    """YoutubeDL that hands progressive HTTP(S) downloads to RangedHttpFD when connections > 1.
+
+    DASH and HLS formats keep yt-dlp's own downloaders; set
+    concurrent_fragment_downloads in the params to fetch their fragments in parallel.
+    """
+
+    def __init__(self, params=None, connections=1, **kwargs):
+        super().__init__(params, **kwargs)
+        self.connections = connections
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if subtitle or test or name == '-' or not info.get('url'):
+            return super().dl(name, info, subtitle, test)
+        if self.connections < 2 or not RangedHttpFD.supports(info):
+            discard_ranged_partial(f"{name}.part")
+            return super().dl(name, info, subtitle, test)
+
+        fd = RangedHttpFD(self, self.params, self.connections)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
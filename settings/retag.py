@@ -0,0 +1,104 @@
+# settings/retag.py
+#
+# Bulk re-tag: push the title/author/genre stored in music.db (and optionally
+# fresh cover art) back into the library's files, on a process pool so tag
+# parsing and writing use every core. Only fields that differ are written, and
+# files whose tags already match are not saved at all.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from .config import MUSIC_AUTO_ADD, OUTPUT_DIR, RETAG_WORKERS
+from .database import get_songs_for_retag
+
+# Thumbnails tried for --artwork, best first
+YOUTUBE_COVER_URLS = (
+    "https://i.ytimg.com/vi/{}/maxresdefault.jpg",
+    "https://i.ytimg.com/vi/{}/hqdefault.jpg",
+)
+
+
+def find_library_file(filename, path=None):
+    """Where a song's file lives now: its recorded path, the Music auto-add folder or OUTPUT_DIR, else None."""
+    if path and os.path.isfile(path):
+        return path
+    for folder in (MUSIC_AUTO_ADD, OUTPUT_DIR):
+        if folder and filename:
+            path = os.path.join(folder, filename)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def _cover_for(video_id):
+    from .artwork import get_cover_bytes
+    for url in YOUTUBE_COVER_URLS:
+        cover = get_cover_bytes(url.format(video_id))
+        if cover:
+            return cover
+    return None
+
+
+def _retag_one(task):
+    """Worker process: update one file; returns a result dict."""
+    from .apply_metadata import update_tags
+    song_id, path, title, author, genre, video_id, artwork, dry_run = task
+    result = {'id': song_id, 'path': path, 'changed': [], 'error': None}
+    try:
+        # Only YouTube ids (no "extractor:" prefix) have a predictable thumbnail URL
+        cover = _cover_for(video_id) if artwork and video_id and ':' not in video_id else None
+        result['changed'] = update_tags(path, title, author, genre, cover_data=cover, dry_run=dry_run)
+        result['status'] = 'updated' if result['changed'] else 'unchanged'
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    return result
+
+
+def retag_library(ids=None, artwork=False, workers=RETAG_WORKERS, dry_run=False, on_result=None):
+    """Re-tag the library files of the given song ids (default: all) from music.db.
+
+    on_result(result) is called in the parent for every song, with id, path,
+    status ("updated", "unchanged", "missing" or "error"), changed fields and
+    error. Returns a summary with the counts, elapsed seconds and files/s.
+    """
+    started = time.perf_counter()
+    counts = {'updated': 0, 'unchanged': 0, 'missing': 0, 'error': 0}
+
+    def report(result):
+        counts[result['status']] += 1
+        if on_result:
+            on_result(result)
+
+    tasks = []
+    for song_id, title, author, genre, filename, video_id, path in get_songs_for_retag(ids):
+        path = find_library_file(filename, path) if filename or path else None
+        if path is None:
+            report({'id': song_id, 'path': None, 'status': 'missing', 'changed': [], 'error': None})
+            continue
+        tasks.append((song_id, path, title, author, genre, video_id, artwork, dry_run))
+
+    if tasks:
+        workers = max(1, min(workers, len(tasks)))
+        # Batches of tasks per round trip; small enough to keep every worker busy at the end
+        chunksize = max(1, min(64, len(tasks) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_retag_one, tasks, chunksize=chunksize):
+                report(result)
+
+    elapsed = time.perf_counter() - started
+    files = len(tasks)
+    summary = {
+        'files': files,
+        'updated': counts['updated'],
+        'unchanged': counts['unchanged'],
+        'missing': counts['missing'],
+        'errors': counts['error'],
+        'dry_run': dry_run,
+        'elapsed': round(elapsed, 3),
+        'files_per_s': round(files / elapsed, 1) if elapsed else 0.0,
+    }
+    print(f"Re-tagged {summary['updated']} of {files} files ({summary['unchanged']} already matched, "
+          f"{summary['missing']} missing, {summary['errors']} errors) in {elapsed:.1f}s, "
+          f"{summary['files_per_s']} files/s")
+    return summary
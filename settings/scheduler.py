@@ -0,0 +1,249 @@
+# settings/scheduler.py
+#
+# Per-site request scheduling for extraction and media downloads.
+#
+# Every site (youtube.com, or the registered domain of anything else) gets a
+# lane. Extractions take a token from the lane's bucket, and media downloads
+# take one of its concurrency slots. Failed requests are classified as
+# throttled, retryable or fatal. Throttled and retryable requests are retried
+# with exponential backoff and jitter. A throttled request also halves the
+# lane's extraction rate and its concurrency (and pauses the lane for any
+# Retry-After the server sent). Both climb back one step per
+# THROTTLE_RECOVERY seconds without throttling.
+
+import http.client
+import random
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import requests
+from yt_dlp.networking.exceptions import TransportError
+from yt_dlp.utils import DownloadError, ExtractorError
+from .config import (EXTRACT_RATE, EXTRACT_BURST, HOST_CONCURRENCY, RETRY_ATTEMPTS, RETRY_BASE_DELAY,
+                     THROTTLE_BASE_DELAY, RETRY_MAX_DELAY, THROTTLE_RECOVERY)
+from .metrics import record_retry
+from .utils import extract_video_id
+
+# Error classes
+THROTTLED = "throttled"
+RETRYABLE = "retryable"
+FATAL = "fatal"
+
+THROTTLE_MARKERS = (
+    "too many requests", "too many 429", "confirm you're not a bot", "confirm you’re not a bot",
+    "rate-limited", "rate limited", "rate limit",
+)
+FATAL_MARKERS = (
+    "video unavailable", "private video", "unsupported url", "has been removed", "copyright",
+    "not available in your country", "members-only", "confirm your age", "no video formats",
+    "requested format is not available", "is not a valid url", "ffmpeg",
+)
+NETWORK_ERRORS = (
+    requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+    TransportError, http.client.IncompleteRead, socket.timeout, ConnectionError, TimeoutError,
+)
+_STATUS_IN_MESSAGE = re.compile(r'\bHTTP(?: Error)? (\d{3})\b')
+
+
+def site_key(url):
+    """Lane name for a URL: "youtube.com" for any YouTube spelling, else the last two host labels."""
+    if extract_video_id(url):
+        return "youtube.com"
+    host = (urlparse(url).hostname or "").lower()
+    if not host or host.replace('.', '').isdigit() or ':' in host:
+        return host
+    return '.'.join(host.split('.')[-2:])
+
+
+def _causes(error):
+    """error and everything it wraps (yt-dlp exc_info/cause, __cause__, __context__)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        error = ((exc_info[1] if exc_info else None) or getattr(error, 'cause', None)
+                 or error.__cause__ or error.__context__)
+
+
+def _status_and_retry_after(error):
+    status = getattr(error, 'status', None) or getattr(error, 'code', None)
+    response = getattr(error, 'response', None)
+    if status is None and response is not None:
+        status = getattr(response, 'status_code', None) or getattr(response, 'status', None)
+    if not isinstance(status, int):
+        match = _STATUS_IN_MESSAGE.search(str(error))
+        status = int(match.group(1)) if match else None
+    retry_after = None
+    headers = getattr(response, 'headers', None)
+    if headers is not None:
+        value = headers.get('Retry-After')
+        if value and str(value).strip().isdigit():
+            retry_after = float(value)
+    return status, retry_after
+
+
+def classify_error(error):
+    """(THROTTLED | RETRYABLE | FATAL, retry_after seconds or None) for an exception."""
+    status = retry_after = None
+    for cause in _causes(error):
+        cause_status, after = _status_and_retry_after(cause)
+        status = status or cause_status
+        retry_after = retry_after or after
+    if status == 429:
+        return THROTTLED, retry_after
+    if status is not None and (status >= 500 or status in (403, 408)):
+        # googlevideo answers 403 to expired stream URLs; the retry re-extracts
+        return RETRYABLE, retry_after
+    if status is not None and 400 <= status < 500:
+        return FATAL, None
+
+    messages = " ".join(str(cause) for cause in _causes(error)).lower()
+    if any(marker in messages for marker in THROTTLE_MARKERS):
+        return THROTTLED, retry_after
+    if any(marker in messages for marker in FATAL_MARKERS):
+        return FATAL, None
+    causes = list(_causes(error))
+    if any(isinstance(cause, NETWORK_ERRORS) for cause in causes):
+        return RETRYABLE, retry_after
+    # "Expected" extractor errors are user-facing ones (unavailable, geo-blocked, ...)
+    if any(isinstance(cause, ExtractorError) and cause.expected for cause in causes):
+        return FATAL, None
+    if isinstance(error, DownloadError):
+        return RETRYABLE, retry_after
+    return FATAL, None
+
+
+def backoff_delay(attempt, kind, retry_after=None):
+    """Seconds before retry number attempt: exponential, capped, with the upper half jittered."""
+    base = THROTTLE_BASE_DELAY if kind == THROTTLED else RETRY_BASE_DELAY
+    cap = min(RETRY_MAX_DELAY, base * 2 ** (attempt - 1))
+    return max(cap / 2 + random.uniform(0, cap / 2), retry_after or 0)
+
+
+class SiteLane:
+    """Token bucket for extractions plus an adaptive concurrency limit for downloads, for one site."""
+
+    def __init__(self, site, rate=EXTRACT_RATE, burst=EXTRACT_BURST, max_concurrency=HOST_CONCURRENCY):
+        self.site = site
+        self.max_rate = self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.max_concurrency = self.concurrency = max(1, max_concurrency)
+        self.active = 0
+        self.paused_until = 0.0
+        self._refilled = self._changed = time.monotonic()
+        self._cond = threading.Condition()
+
+    def take_token(self):
+        """Block until an extraction may start."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self._refilled) * self.rate)
+                self._refilled = now
+                if now < self.paused_until:
+                    self._cond.wait(self.paused_until - now)
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    self._cond.wait((1 - self.tokens) / self.rate)
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the lane's download slots."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    self._cond.wait(self.paused_until - now)
+                elif self.active >= self.concurrency:
+                    self._cond.wait()
+                else:
+                    break
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._cond.notify_all()
+
+    def throttled(self, retry_after=None):
+        """Multiplicative decrease: halve the rate and the concurrency in use."""
+        with self._cond:
+            now = time.monotonic()
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self.concurrency = max(1, min(self.concurrency, self.active + 1) // 2)
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            self._changed = now
+        print(f"Throttled by {self.site}: {self.rate:.2f} extractions/s, {self.concurrency} concurrent download(s)")
+
+    def succeeded(self):
+        """Additive increase once the site has gone THROTTLE_RECOVERY seconds without throttling."""
+        with self._cond:
+            now = time.monotonic()
+            if now - self._changed < THROTTLE_RECOVERY:
+                return
+            if self.rate >= self.max_rate and self.concurrency >= self.max_concurrency:
+                return
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 4)
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self._changed = now
+            self._cond.notify_all()
+        print(f"Throttling eased on {self.site}: {self.rate:.2f} extractions/s, {self.concurrency} concurrent download(s)")
+
+
+class RequestScheduler:
+    """Runs extraction and download calls through per-site lanes, retrying what is worth retrying."""
+
+    def __init__(self, rate=EXTRACT_RATE, burst=EXTRACT_BURST, max_concurrency=HOST_CONCURRENCY,
+                 attempts=RETRY_ATTEMPTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.attempts = max(1, attempts)
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def lane(self, url):
+        site = site_key(url)
+        with self._lock:
+            lane = self._lanes.get(site)
+            if lane is None:
+                lane = self._lanes[site] = SiteLane(site, self.rate, self.burst, self.max_concurrency)
+            return lane
+
+    def run(self, url, stage, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) for url, as an "extract" (token) or a download (slot).
+
+        Fatal errors and the last failed attempt are raised as they are.
+        """
+        lane = self.lane(url)
+        for attempt in range(1, self.attempts + 1):
+            try:
+                if stage == "extract":
+                    lane.take_token()
+                    result = fn(*args, **kwargs)
+                else:
+                    with lane.slot():
+                        result = fn(*args, **kwargs)
+            except Exception as e:
+                kind, retry_after = classify_error(e)
+                if kind == THROTTLED:
+                    lane.throttled(retry_after)
+                if kind == FATAL or attempt == self.attempts:
+                    raise
+                delay = backoff_delay(attempt, kind, retry_after)
+                record_retry(stage)
+                print(f"{stage} of {url} failed ({kind}: {e}); retry {attempt}/{self.attempts - 1} in {delay:.1f}s")
+                time.sleep(delay)
+            else:
+                lane.succeeded()
+                return result
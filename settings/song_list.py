@@ -0,0 +1,121 @@
+# settings/song_list.py
+
+import tkinter as tk
+from .database import count_songs, get_songs_after, get_songs_at, search_songs
+
+
+class VirtualSongList:
+    """Drives a Treeview that only ever holds the rows currently on screen.
+
+    The Treeview has one item per visible line; scrolling rewrites their values
+    from a small window of rows fetched from SQLite (keyset pages when scrolling
+    through the library, ranked FTS pages when searching). The scrollbar is
+    driven by the row count, so 100k+ songs cost no more than 10.
+    """
+
+    def __init__(self, tree, scrollbar, rowheight=25, margin=20):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.rowheight = rowheight
+        self.margin = margin
+        self.query = ''
+        self.total = 0
+        self.offset = 0
+        self.visible = int(tree.cget('height'))
+        # Row index -> (id, title, author) for the fetched window around the viewport
+        self.window = {}
+
+        scrollbar.configure(command=self.on_scrollbar)
+        tree.bind("<Configure>", self.on_resize)
+        tree.bind("<MouseWheel>", self.on_mousewheel)
+        tree.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        tree.bind("<Button-5>", lambda e: self.scroll_by(3))
+
+    def set_query(self, query):
+        """Show songs matching query (all songs when empty), scrolled to the top."""
+        self.query = query.strip()
+        self.offset = 0
+        self.reload()
+
+    def reload(self):
+        self.total = count_songs(self.query)
+        self.window = {}
+        self.render()
+
+    def on_song_added(self, song_id):
+        """A song was inserted: grow the list, fetching only if the new row is on screen."""
+        if self.query:
+            # Ranked results may reorder, but only the visible window is refetched
+            self.reload()
+            return
+        self.total += 1
+        if self.total - 1 < self.offset + self.visible:
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, self.total - self.visible))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.offset + rows)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == tk.MOVETO:
+            self.scroll_to(int(float(amount) * self.total))
+        elif unit == tk.PAGES:
+            self.scroll_by(int(amount) * self.visible)
+        else:
+            self.scroll_by(int(amount))
+
+    def on_mousewheel(self, event):
+        # macOS reports small deltas, Windows multiples of 120
+        step = event.delta if abs(event.delta) < 120 else event.delta // 120
+        self.scroll_by(-step)
+
+    def on_resize(self, event):
+        visible = max(1, event.height // self.rowheight - 1)  # minus the heading row
+        if visible != self.visible:
+            self.visible = visible
+            self.scroll_to(self.offset)
+            self.render()
+
+    def fetch(self, start, count):
+        if self.query:
+            rows = [(song_id, title, author) for song_id, title, author, _ in
+                    search_songs(self.query, limit=count, offset=start)]
+        else:
+            anchor = self.window.get(start - 1)
+            rows = get_songs_after(anchor[0], count) if anchor else get_songs_at(start, count)
+        return {start + i: row for i, row in enumerate(rows)}
+
+    def render(self):
+        end = min(self.offset + self.visible, self.total)
+        if any(i not in self.window for i in range(self.offset, end)):
+            start = max(0, self.offset - self.margin)
+            window = self.fetch(start, end + self.margin - start)
+            # Keep the row before the window as keyset anchor for the next page
+            if start - 1 in self.window:
+                window[start - 1] = self.window[start - 1]
+            self.window = window
+
+        rows = [self.window[i] for i in range(self.offset, end) if i in self.window]
+        items = self.tree.get_children()
+        for item in items[len(rows):]:
+            self.tree.delete(item)
+        for i, (song_id, title, author) in enumerate(rows):
+            values = (title or "Unknown", author or "Unknown")
+            if i < len(items):
+                self.tree.item(items[i], values=values)
+            else:
+                self.tree.insert("", tk.END, values=values)
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        if self.total <= self.visible:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / self.total, min(1.0, (self.offset + self.visible) / self.total))
@@ -0,0 +1,100 @@
+# settings/startup_profile.py
+#
+# python main.py --profile-startup
+#
+# Re-runs the interpreter under -X importtime with stderr sent to a temporary
+# file, then prints a summary (phase timings + slowest top-level imports) once
+# the window has painted, instead of thousands of raw importtime lines.
+
+import os
+import sys
+import tempfile
+import time
+
+FLAG = "--profile-startup"
+TOP_IMPORTS = 15
+
+_LOG_ENV = "ZEROMUSIC_IMPORTTIME_LOG"
+_STDERR_ENV = "ZEROMUSIC_IMPORTTIME_STDERR"
+
+_marks = []
+
+
+def begin():
+    """Call first thing in main.py. Returns True when startup is being profiled."""
+    if FLAG not in sys.argv:
+        return False
+    # A frozen app cannot be re-executed with -X; it only gets the phase timings
+    if 'importtime' not in sys._xoptions and not getattr(sys, 'frozen', False):
+        log = tempfile.NamedTemporaryFile(prefix="0music-importtime-", suffix=".log", delete=False)
+        saved_stderr = os.dup(2)
+        os.set_inheritable(saved_stderr, True)
+        os.dup2(log.fileno(), 2)
+        os.environ[_LOG_ENV] = log.name
+        os.environ[_STDERR_ENV] = str(saved_stderr)
+        os.execv(sys.executable, [sys.executable, "-X", "importtime"] + sys.argv)
+    mark("interpreter ready")
+    return True
+
+
+def mark(label):
+    _marks.append((label, time.perf_counter()))
+
+
+def parse_importtime(lines):
+    """(cumulative_us, module) for every top-level import in -X importtime output."""
+    entries = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip("\n")
+        entries.append((len(name) - len(name.lstrip()), int(parts[1]), name.strip()))
+    if not entries:
+        return []
+    top = min(depth for depth, _, _ in entries)
+    return [(cumulative, name) for depth, cumulative, name in entries if depth == top]
+
+
+def _restore_stderr():
+    """Point fd 2 back at the terminal; returns the captured log lines."""
+    log_path = os.environ.pop(_LOG_ENV, None)
+    saved_stderr = os.environ.pop(_STDERR_ENV, None)
+    if not log_path:
+        return []
+    sys.stderr.flush()
+    if saved_stderr:
+        os.dup2(int(saved_stderr), 2)
+        os.close(int(saved_stderr))
+    try:
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            lines = f.readlines()
+        os.remove(log_path)
+    except OSError:
+        return []
+    # Anything else written to stderr meanwhile (warnings, tracebacks) still gets shown
+    for line in lines:
+        if not line.startswith("import time:"):
+            sys.stderr.write(line)
+    return lines
+
+
+def report(out=sys.stdout):
+    mark("window painted")
+    imports = parse_importtime(_restore_stderr())
+
+    print("Startup profile", file=out)
+    start = _marks[0][1]
+    previous = start
+    for label, at in _marks:
+        print(f"  {label:<28} +{(at - previous) * 1000:8.1f} ms  ({(at - start) * 1000:8.1f} ms total)", file=out)
+        previous = at
+
+    if imports:
+        total = sum(cumulative for cumulative, _ in imports)
+        print(f"Imports before first paint: {total / 1000:.1f} ms across {len(imports)} top-level modules", file=out)
+        for cumulative, name in sorted(imports, reverse=True)[:TOP_IMPORTS]:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}", file=out)
+    out.flush()
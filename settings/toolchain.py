@@ -0,0 +1,102 @@
+# settings/toolchain.py
+
+import os
+import re
+import shutil
+import subprocess
+import threading
+from .config import FFMPEG_LOCATION
+
+# Common ffmpeg locations on macOS
+COMMON_FFMPEG_DIRS = [
+    '/opt/homebrew/bin',  # Apple Silicon Homebrew
+    '/usr/local/bin',     # Intel Homebrew
+    '/usr/bin',           # System
+]
+
+
+class FFmpegToolchain:
+    """A probed ffmpeg/ffprobe pair and what it can do."""
+
+    def __init__(self, directory, ffmpeg, ffprobe, version, encoders):
+        self.directory = directory
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.version = version
+        self.encoders = frozenset(encoders)
+
+    def has_encoder(self, name):
+        return name in self.encoders
+
+    def __repr__(self):
+        return f"<FFmpegToolchain {self.version} at {self.directory}>"
+
+
+def _probe(ffmpeg):
+    """Run ffmpeg once for its version and once for its encoder list."""
+    out = subprocess.run([ffmpeg, '-version'], capture_output=True, check=True, timeout=5, text=True).stdout
+    match = re.match(r'ffmpeg version (\S+)', out)
+    version = match.group(1) if match else None
+
+    encoders = set()
+    try:
+        out = subprocess.run([ffmpeg, '-hide_banner', '-encoders'], capture_output=True, check=True, timeout=5, text=True).stdout
+        # Lines look like " A....D libmp3lame           libmp3lame MP3 (MPEG audio layer 3)"
+        for line in out.splitlines():
+            parts = line.split()
+            if len(parts) >= 2 and parts[1] != '=' and re.fullmatch(r'[VAS][.A-Z]{5}', parts[0]):
+                encoders.add(parts[1])
+    except (subprocess.SubprocessError, OSError) as e:
+        print(f"Warning: could not list ffmpeg encoders: {e}")
+    return version, encoders
+
+
+def _candidate_dirs():
+    if FFMPEG_LOCATION:
+        # Explicit override: a directory, or the path of the ffmpeg binary itself
+        if os.path.isdir(FFMPEG_LOCATION):
+            return [FFMPEG_LOCATION]
+        return [os.path.dirname(FFMPEG_LOCATION)]
+
+    dirs = list(COMMON_FFMPEG_DIRS)
+    # Try to find via shutil.which (works in development)
+    ffmpeg_which = shutil.which('ffmpeg')
+    if ffmpeg_which:
+        dirs.append(os.path.dirname(ffmpeg_which))
+    return dirs
+
+
+def discover_toolchain():
+    """Probe for ffmpeg/ffprobe without using the cache. Returns None if not found."""
+    for path in _candidate_dirs():
+        ffmpeg = os.path.join(path, 'ffmpeg')
+        ffprobe = os.path.join(path, 'ffprobe')
+        if os.path.exists(ffmpeg) and os.path.exists(ffprobe):
+            try:
+                version, encoders = _probe(ffmpeg)
+            except (subprocess.SubprocessError, OSError):
+                continue
+            return FFmpegToolchain(path, ffmpeg, ffprobe, version, encoders)
+    return None
+
+
+_toolchain = None
+_toolchain_lock = threading.Lock()
+
+def get_toolchain():
+    """Return the process-wide toolchain, probing only on first use.
+
+    A failed probe is not cached, so installing ffmpeg while the app runs is
+    picked up on the next call.
+    """
+    global _toolchain
+    with _toolchain_lock:
+        if _toolchain is None:
+            _toolchain = discover_toolchain()
+        return _toolchain
+
+def invalidate_toolchain():
+    """Forget the cached toolchain so the next get_toolchain() probes again."""
+    global _toolchain
+    with _toolchain_lock:
+        _toolchain = None
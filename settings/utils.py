@@ -1,3 +1,6 @@
+import re
+from urllib.parse import urlparse, parse_qs
+
 def clear_placeholder(entry, placeholder, fg=None):
     if entry.get() == placeholder:
         entry.delete(0, 'end')
@@ -19,3 +22,25 @@ def sanitize_filename(name):
     for ch in invalid_chars:
         name = name.replace(ch, '')
     return name.strip()
+
+def _host_in(host, domains):
+    """True if host is one of domains or a subdomain of one."""
+    return any(host == d or host.endswith('.' + d) for d in domains)
+
+def extract_video_id(url):
+    """Return the YouTube video ID for any common URL form, or None."""
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or '').lower()
+    if _host_in(host, ('youtu.be',)):
+        video_id = parsed.path.lstrip('/').split('/')[0]
+    elif _host_in(host, ('youtube.com', 'youtube-nocookie.com')):
+        video_id = parse_qs(parsed.query).get('v', [None])[0]
+        if not video_id:
+            parts = parsed.path.strip('/').split('/')
+            if len(parts) >= 2 and parts[0] in ('shorts', 'embed', 'live', 'v'):
+                video_id = parts[1]
+    else:
+        return None
+    if video_id and re.fullmatch(r'[0-9A-Za-z_-]{11}', video_id):
+        return video_id
+    return None
@@ -0,0 +1,58 @@
+# tests/test_library_scan.py
+#
+#     python -m unittest discover tests
+
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+from settings import database, library_scan
+from settings.database import add_song, get_scan_rows, set_db_path
+
+
+class AutoAddTransitTest(unittest.TestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.output_dir = os.path.join(workdir.name, 'out')
+        self.auto_add = os.path.join(workdir.name, 'Automatically Add to Music')
+        os.makedirs(self.output_dir)
+        os.makedirs(self.auto_add)
+
+        previous = database._db_path
+        set_db_path(os.path.join(workdir.name, 'music.db'))
+        self.addCleanup(set_db_path, previous)
+        for name, value in (('OUTPUT_DIR', self.output_dir), ('MUSIC_AUTO_ADD', self.auto_add)):
+            patcher = mock.patch.object(library_scan, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def add(self, folder, name):
+        path = os.path.join(folder, name)
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 1024)
+        return add_song(name, name, "Artist", None, datetime.now(), None, path=path), path
+
+    def scan(self):
+        summary = library_scan.reconcile_library(roots=[self.output_dir, self.auto_add], settle=0)
+        return summary, {row[0]: row[6] for row in get_scan_rows()}
+
+    def test_file_imported_from_auto_add_is_not_missing(self):
+        imported, imported_path = self.add(self.auto_add, 'imported.mp3')
+        deleted, deleted_path = self.add(self.output_dir, 'deleted.mp3')
+        self.scan()
+
+        # Music.app took the first file; the second one is really gone
+        os.remove(imported_path)
+        os.remove(deleted_path)
+        summary, missing = self.scan()
+
+        self.assertEqual(missing[imported], 0)
+        self.assertEqual(missing[deleted], 1)
+        self.assertEqual(summary['imported'], 1)
+        self.assertEqual(summary['missing'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# tests/test_ranged_download.py
+#
+#     python -m unittest discover tests
+
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from yt_dlp import YoutubeDL
+from settings.config import RANGE_CHUNK_MIN
+from settings.ranged_download import RangedHttpFD, plan_ranges
+
+SIZE = 3 * RANGE_CHUNK_MIN + 12345
+
+
+def serve(body, requested):
+    """Local server for body that answers range requests; requested collects (start, end) of each one."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+            start, end = 0, len(body) - 1
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2) or end), end)
+                requested.append((start, end))
+                self.send_response(206)
+                self.send_header('Content-Range', f"bytes {start}-{end}/{len(body)}")
+            else:
+                self.send_response(200)
+            self.send_header('Content-Length', str(end + 1 - start))
+            self.end_headers()
+            self.wfile.write(body[start:end + 1])
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class RangedResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.body = os.urandom(SIZE)
+        self.requested = []
+        self.server = serve(self.body, self.requested)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.filename = os.path.join(workdir.name, 'track.m4a')
+        self.info = {'url': f"http://127.0.0.1:{self.server.server_port}/audio.m4a", 'http_headers': {}}
+
+    def download(self, connections=4):
+        ydl = YoutubeDL({'quiet': True, 'noprogress': True})
+        self.addCleanup(ydl.close)
+        fd = RangedHttpFD(ydl, ydl.params, connections)
+        self.assertTrue(fd.real_download(self.filename, self.info))
+        with open(self.filename, 'rb') as f:
+            return f.read()
+
+    def test_single_connection_partial_is_resumed(self):
+        # What an interrupted HttpFD attempt leaves: a plain prefix and no .ranges sidecar
+        prefix = RANGE_CHUNK_MIN + RANGE_CHUNK_MIN // 2
+        with open(f"{self.filename}.part", 'wb') as f:
+            f.write(self.body[:prefix])
+
+        self.assertEqual(self.download(), self.body)
+        fetched = [r for r in self.requested if r != (0, 0)]
+        ranges = plan_ranges(SIZE, 4)
+        self.assertTrue(any(end < prefix for start, end in ranges))
+        self.assertEqual(sorted(fetched), [r for r in ranges if r[1] >= prefix])
+        self.assertFalse(os.path.exists(f"{self.filename}.part.ranges"))
+
+    def test_partial_longer_than_file_starts_over(self):
+        with open(f"{self.filename}.part", 'wb') as f:
+            f.write(os.urandom(SIZE + 1))
+
+        self.assertEqual(self.download(), self.body)
+        self.assertEqual(sorted(r for r in self.requested if r != (0, 0)), plan_ranges(SIZE, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()